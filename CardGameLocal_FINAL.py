@@ -1,130 +1,277 @@
-import random
-import time
 import cProfile
+import random
+
+import blackjack_metrics
+from blackjack_shuffle import make_shuffler
+from blackjack_output import ConsoleSink
+
+DEALER_STAND_VALUE = 17  # The dealer keeps hitting while their hand is below this value
+
+SUITS = ('Hearts', 'Diamonds', 'Clubs', 'Spades')
+RANKS = ('2', '3', '4', '5', '6', '7', '8', '9', '10', 'Jack', 'Queen', 'King', 'Ace')
+# Face cards are worth 10, Aces are worth 11, others are worth their integer value
+RANK_VALUES = (2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11)
 
+# Card counting systems: the tag added to the running count when each rank (2 to Ace) is dealt
+COUNT_SYSTEMS = {
+    'hi-lo': (1, 1, 1, 1, 1, 0, 0, 0, -1, -1, -1, -1, -1),
+    'ko': (1, 1, 1, 1, 1, 1, 0, 0, -1, -1, -1, -1, -1),
+    'hi-opt-i': (0, 1, 1, 1, 1, 0, 0, 0, -1, -1, -1, -1, 0),
+    'hi-opt-ii': (1, 1, 2, 2, 1, 1, 0, 0, -2, -2, -2, -2, 0),
+    'omega-ii': (1, 1, 2, 2, 2, 1, 0, -1, -2, -2, -2, -2, 0),
+    'zen': (1, 1, 2, 2, 2, 1, 0, 0, -2, -2, -2, -2, -1),
+}
+
+@blackjack_metrics.instrument('get_value')
 class Card: # Represents a single playing card
-    
-    execution_times = {'get_value': 0}
 
-    def __init__(self, suit, value):
-        self.suit = suit  # Initialize a card with a suit
-        self.value = value  # Initialize a card with a value
-        
+    __slots__ = ('suit', 'value', 'code', 'rank', 'points', 'is_ace')
+    interned = {}  # Every (suit, value) pair is created once and shared by all decks
+
+    def __new__(cls, suit, value):
+        card = cls.interned.get((suit, value))
+        if card is None:
+            card = super().__new__(cls)
+            card.suit = suit  # Initialize a card with a suit
+            card.value = value  # Initialize a card with a value
+            card.code = SUITS.index(suit) * 13 + RANKS.index(value)  # Position of the card in an unshuffled deck (0-51)
+            card.rank = card.code % 13  # Index into RANKS
+            card.points = RANK_VALUES[card.rank]  # Blackjack value looked up once
+            card.is_ace = value == 'Ace'
+            cls.interned[(suit, value)] = card
+        return card
+
+    def __reduce__(self):
+        return (Card, (self.suit, self.value))  # Unpickling goes through __new__ so cards stay interned
+
     def __repr__(self):
         return f"{self.value} of {self.suit}"  # Return a string representation of the card
     
     def get_value(self):
-        start_time = time.time()  # Start performance measurement
-        # Face cards are worth 10, Aces are worth 11, others are worth their integer value
-        result = 10 if self.value in ['Jack', 'Queen', 'King'] else 11 if self.value == 'Ace' else int(self.value)
-        end_time = time.time()  # End performance measurement
-        Card.execution_times['get_value'] += end_time - start_time  # Update execution time
-        return result
+        return self.points
+
+DECK_ORDER = tuple(Card(suit, value) for suit in SUITS for value in RANKS)  # Indexed by Card.code
 
+def card_from_code(code):
+    return DECK_ORDER[code]
+
+@blackjack_metrics.instrument('__init__', 'shuffle', 'deal')
 class Deck: # Represents a deck of 52 cards
-    
-    execution_times = {'__init__': 0, 'shuffle': 0, 'deal': 0}
 
-    def __init__(self):
-        start_time = time.time()  # Start performance measurement
-        # Create a list of Card objects for each combination of suit and value
-        self.cards = [Card(suit, value) for suit in ['Hearts', 'Diamonds', 'Clubs', 'Spades']
-                      for value in ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'Jack', 'Queen', 'King', 'Ace']]
+    def __init__(self, rng=None, shuffler=None, counting='hi-lo'):
+        self.shuffler = shuffler or make_shuffler(rng=rng)  # Uses the global random module unless a seeded generator is given
+        self.count_tags = COUNT_SYSTEMS[counting]  # Running count tag for each rank
+        self.decks = 1
+        self.cards = list(DECK_ORDER)  # One reference to each shared Card, in suit then value order
         self.shuffle()  # Shuffle the deck after initialization
-        end_time = time.time()  # End performance measurement
-        Deck.execution_times['__init__'] += end_time - start_time  # Update execution time
 
     def shuffle(self):
-        start_time = time.time()  # Start performance measurement
-        # Shuffle the deck using the Fisher-Yates algorithm
-        for i in range(len(self.cards) - 1, 0, -1):
-            j = random.randint(0, i)
-            self.cards[i], self.cards[j] = self.cards[j], self.cards[i]  # Swap the cards
-        end_time = time.time()  # End performance measurement
-        Deck.execution_times['shuffle'] += end_time - start_time  # Update execution time
+        self.shuffle_cards()
+
+    def shuffle_cards(self):
+        # Not instrumented, so a Shoe shuffling through it is only timed once, as Shoe.shuffle
+        self.shuffler.shuffle(self.cards)  # Shuffle the deck in place using the Fisher-Yates algorithm
+        self.recount()
 
     def deal(self):
-        start_time = time.time()  # Start performance measurement
         if self.cards:
             card = self.cards.pop()  # Remove and return the last card in the deck
-            end_time = time.time()  # End performance measurement
-            Deck.execution_times['deal'] += end_time - start_time  # Update execution time
+            self.rank_counts[card.rank] -= 1  # Keep the composition and the count up to date as cards leave
+            self.running_count += self.count_tags[card.rank]
             return card
         else:
-            end_time = time.time()  # End performance measurement
-            Deck.execution_times['deal'] += end_time - start_time  # Update execution time
             raise ValueError("The deck is empty.")  # Raise an error if the deck is empty
 
+    def remaining_cards(self):
+        return self.cards
+
+    def cards_remaining(self):
+        return len(self.cards)
+
+    def recount(self):
+        # Rebuild the rank counts from the cards still to be dealt; the running count covers every card already dealt
+        self.rank_counts = [0] * 13
+        for card in self.remaining_cards():
+            self.rank_counts[card.rank] += 1
+        full = 4 * self.decks
+        self.running_count = sum(tag * (full - count) for tag, count in zip(self.count_tags, self.rank_counts))
+
+    def true_count(self):
+        # Running count per deck still to be dealt
+        decks_left = self.cards_remaining() / 52
+        return self.running_count / decks_left if decks_left else 0.0
+
+    def composition(self):
+        # Cards left by blackjack value 2-11, the format blackjack_probability and blackjack_strategy use
+        counts = self.rank_counts
+        return tuple(counts[:8]) + (counts[8] + counts[9] + counts[10] + counts[11], counts[12])
+
+@blackjack_metrics.instrument('__init__', 'shuffle', 'deal')
+class Shoe(Deck): # Represents one or more decks dealt from a shoe with a cut card
+
+    def __init__(self, decks=1, penetration=0.75, rng=None, shuffler=None, counting='hi-lo'):
+        if decks < 1 or not 0 < penetration <= 1:
+            raise ValueError("A shoe needs at least one deck and a penetration between 0 and 1.")
+        self.shuffler = shuffler or make_shuffler(rng=rng)
+        self.count_tags = COUNT_SYSTEMS[counting]
+        self.decks = decks
+        self.cards = list(DECK_ORDER) * decks  # Cards stay in the shoe; dealing only moves a position
+        self.cut = int(len(self.cards) * penetration)  # Number of cards dealt before the cut card comes out
+        self.shuffle()
+
+    def shuffle(self):
+        self.dealt = 0
+        self.shuffle_cards()  # Reshuffle every card in place, reusing the same list
+
+    def deal(self):
+        if self.dealt == len(self.cards):
+            self.shuffle()  # Never run dry in the middle of a round
+        self.dealt += 1
+        card = self.cards[-self.dealt]  # Deal from the end of the list, like Deck.deal
+        self.rank_counts[card.rank] -= 1
+        self.running_count += self.count_tags[card.rank]
+        return card
+
+    def remaining_cards(self):
+        return self.cards[:len(self.cards) - self.dealt]
+
+    def cards_remaining(self):
+        return len(self.cards) - self.dealt
+
+    def check_cut_card(self):
+        # Reshuffle between rounds once the cut card has been reached
+        if self.dealt >= self.cut:
+            self.shuffle()
+            return True
+        return False
+
+@blackjack_metrics.instrument('__init__', 'add_card', 'adjust_for_aces')
 class Hand: # Represents a player's hand or the dealer's hand
-    
-    execution_times = {'__init__': 0, 'add_card': 0, 'adjust_for_aces': 0}
-    
+
     def __init__(self):
-        start_time = time.time()  # Start performance measurement
         self.cards = []  # Initialize an empty hand
         self.value = 0  # Initialize hand value
         self.aces = 0  # Initialize ace count
-        end_time = time.time()  # End performance measurement
-        Hand.execution_times['__init__'] += end_time - start_time  # Update execution time
     
     def add_card(self, card):
-        start_time = time.time()  # Start performance measurement
         self.cards.append(card)  # Add a card to the hand
-        self.value += card.get_value()  # Update the hand's value
-        if card.value == 'Ace':
+        self.value += card.points  # Update the hand's value
+        if card.is_ace:
             self.aces += 1  # Increment ace count
         self.adjust_for_aces()  # Adjust the value if the hand has Aces and is over 21
-        end_time = time.time()  # End performance measurement
-        Hand.execution_times['add_card'] += end_time - start_time  # Update execution time
     
     def adjust_for_aces(self):
-        start_time = time.time()  # Start performance measurement
         while self.value > 21 and self.aces:
             self.value -= 10  # Adjust the value for Aces
             self.aces -= 1  # Decrement ace count
-        end_time = time.time()  # End performance measurement
-        Hand.execution_times['adjust_for_aces'] += end_time - start_time  # Update execution time
 
     def __repr__(self):
         return f"{', '.join(map(str, self.cards))} (Value: {self.value})"  # Return a string representation of the hand's cards and value
 
+# A hand's score is fully described by its total and whether an Ace still counts as 11 (at most
+# one can). Both are packed into a state number, total | soft << 5, and the effect of every card
+# on every state is worked out once, so FastHand.add_card is a single table lookup.
+SOFT_FLAG = 32
+HAND_STATES = 64
+
+def next_hand_state(state, points):
+    # Reference transition: exactly what Hand.add_card and Hand.adjust_for_aces do
+    value, aces = state & 31, state >> 5
+    if value > 21 or (aces and value < 11):
+        return state  # A bust hand stays bust, and a soft total below 11 can never be reached
+    value += points
+    aces += points == 11
+    while value > 21 and aces:
+        value -= 10
+        aces -= 1
+    return value | (aces << 5)
+
+TRANSITIONS = [next_hand_state(state, points) for state in range(HAND_STATES) for points in range(12)]  # Indexed by state * 12 + points
+
+def reachable_hand_states():
+    # Every state a hand can actually be in, starting from an empty hand
+    found, frontier = {0}, [0]
+    while frontier:
+        state = frontier.pop()
+        for points in range(2, 12):
+            following = TRANSITIONS[state * 12 + points]
+            if following not in found:
+                found.add(following)
+                frontier.append(following)
+    return sorted(found)
+
+REACHABLE_STATES = reachable_hand_states()
+STATE_SOFT = [state >= SOFT_FLAG for state in range(HAND_STATES)]
+STATE_BUST = [state & 31 > 21 for state in range(HAND_STATES)]
+
+class FastHand: # A Hand that keeps its score as a single precomputed state
+
+    __slots__ = ('cards', 'state', 'value')
+
+    def __init__(self):
+        self.cards = []
+        self.state = 0  # Empty hand: total 0, no soft Ace
+        self.value = 0
+
+    def add_card(self, card):
+        self.cards.append(card)
+        self.state = state = TRANSITIONS[self.state * 12 + card.points]
+        self.value = state & 31
+
+    def adjust_for_aces(self):
+        pass  # Already folded into the transition table
+
+    @property
+    def aces(self):
+        return self.state >> 5  # Number of Aces still counted as 11, like Hand.aces
+
+    def is_soft(self):
+        return STATE_SOFT[self.state]
+
+    def is_bust(self):
+        return STATE_BUST[self.state]
+
+    def is_blackjack(self):
+        return self.state == 21 | SOFT_FLAG and len(self.cards) == 2  # An Ace and a ten-value card
+
+    def __repr__(self):
+        return f"{', '.join(map(str, self.cards))} (Value: {self.value})"
+
+@blackjack_metrics.instrument('__init__', 'start_game', 'initial_deal', 'show_hands', 'dealer_turn', 'determine_winners')
 class Game: # Represents a game of Blackjack
-    
-    execution_times = {'__init__': 0, 'start_game': 0, 'collect_bets': 0, 'initial_deal': 0,
-                       'show_hands': 0, 'player_turn': 0, 'handle_bust': 0, 'dealer_turn': 0,
-                       'determine_winners': 0, 'play_again': 0}
 
-    def __init__(self, players, starting_funds):
-        start_time = time.time()  # Start performance measurement
+    def __init__(self, players, starting_funds, decks=1, penetration=0.75, output=None):
         self.players = [{'hand': Hand(), 'funds': starting_funds, 'bet': 0} for _ in range(players)]  # Initialize player hands and funds
         self.dealer = Hand()  # Initialize dealer's hand
-        self.deck = Deck()  # Initialize a new deck
-        end_time = time.time()  # End performance measurement
-        Game.execution_times['__init__'] += end_time - start_time  # Update execution time
+        # Initialize a shoe that reshuffles itself at the cut card. It gets a generator of its own, so saving
+        # and restoring the game (see blackjack_checkpoint) never touches the one every other shoe shares
+        self.deck = Shoe(decks, penetration, rng=random.Random())
+        self.output = output if output is not None else ConsoleSink()  # Where game events are sent, see blackjack_output
 
     def start_game(self):
-        start_time = time.time()  # Start performance measurement
-        print("Starting a game of Blackjack!")
+        self.output.emit('start')
         while self.players:
             self.players = [player for player in self.players if player['funds'] > 0]  # Remove players who have no funds left
             if not self.players:
-                print("No players have enough funds to continue. Game over.")
+                self.output.emit('game_over')
                 break
 
             self.collect_bets()  # Collect bets from all players
             if not self.players:
-                print("No players have enough funds to continue. Game over.")
+                self.output.emit('game_over')
                 break
 
+            if self.deck.check_cut_card():
+                self.output.emit('reshuffle')
             self.initial_deal()  # Deal initial cards to players and dealer
             self.show_hands(initial=True)  # Show hands initially
 
             for i, player in enumerate(self.players[:]):
                 if player['funds'] > 0:
-                    print(f"\nPlayer {i + 1}'s turn:")
+                    self.output.emit('player_turn', player=i + 1)
                     self.player_turn(player)  # Handle player's turn
 
-            print("\nDealer's turn:")
+            self.output.emit('dealer_turn')
             self.dealer_turn()  # Dealer's turn
             self.show_hands(final=True)  # Show final hands
 
@@ -132,10 +279,9 @@ class Game: # Represents a game of Blackjack
 
             if not self.play_again():  # Ask if players want to play again
                 break
-        end_time = time.time()  # End performance measurement
-        Game.execution_times['start_game'] += end_time - start_time  # Update execution time
 
     def collect_bets(self):
+        self.output.flush()  # Show everything emitted so far before prompting
         for i, player in enumerate(self.players):
             if player['funds'] > 0:
                 bet = get_valid_integer_input(f"Player {i + 1}, enter your bet (current funds: {player['funds']}): ", min_value=1, max_value=player['funds'])
@@ -143,7 +289,6 @@ class Game: # Represents a game of Blackjack
                 player['funds'] -= bet  # Deduct the bet from the player's funds
 
     def initial_deal(self):
-        start_time = time.time()  # Start performance measurement
         for player in self.players:
             player['hand'] = Hand()  # Reset player hand
             player['hand'].add_card(self.deck.deal())  # Deal two cards to the player
@@ -151,23 +296,18 @@ class Game: # Represents a game of Blackjack
         self.dealer = Hand()  # Reset dealer hand
         self.dealer.add_card(self.deck.deal())  # Deal two cards to the dealer
         self.dealer.add_card(self.deck.deal())
-        end_time = time.time()  # End performance measurement
-        Game.execution_times['initial_deal'] += end_time - start_time  # Update execution time
 
     def show_hands(self, initial=False, final=False):
-        start_time = time.time()  # Start performance measurement
         if initial:
             _ = "\nCurrent Hands: "
         elif final:
             _ = "\nDealer's final hand: "
-        end_time = time.time()  # End performance measurement
-        Game.execution_times['show_hands'] += end_time - start_time  # Update execution time
 
     def player_turn(self, player):
         while True:
-            print(player['hand'])  # Show player's hand
+            self.output.emit('hand', hand=player['hand'])  # Show player's hand
             if player['hand'].value == 21:
-                print("Blackjack!")
+                self.output.emit('blackjack')
                 break
             elif player['hand'].value > 21:
                 self.handle_bust(player)  # Handle bust
@@ -183,50 +323,56 @@ class Game: # Represents a game of Blackjack
                 break
 
     def handle_bust(self, player):
-        print(f"You bust with {player['hand'].value}!")  # Notify bust
+        self.output.emit('bust', value=player['hand'].value)  # Notify bust
+        self.output.flush()
         input("Please enter C to continue: ")  # Pause for user input
 
     def dealer_turn(self):
-        start_time = time.time()  # Start performance measurement
-        while self.dealer.value < 17:
+        while self.dealer.value < DEALER_STAND_VALUE:
             self.dealer.add_card(self.deck.deal())  # Dealer hits
         if self.dealer.value > 21:
-            print("Dealer busts!")  # Notify dealer bust
-        end_time = time.time()  # End performance measurement
-        Game.execution_times['dealer_turn'] += end_time - start_time  # Update execution time
+            self.output.emit('dealer_bust')  # Notify dealer bust
 
     def determine_winners(self):
-        start_time = time.time()  # Start performance measurement
         dealer_value = self.dealer.value
-        print(f"\nDealer's final hand: {self.dealer}")
+        self.output.emit('dealer_hand', hand=self.dealer)
 
         for i, player in enumerate(self.players):
             player_value = player['hand'].value
+            payout = settle_bet(player_value, dealer_value, player['bet'])
+            player['funds'] += payout  # Return the winnings (or the bet on a tie) to the player
             if player_value > 21:
-                print(f"Player {i + 1} busts and loses their bet of {player['bet']} (Total funds: {player['funds']})")
-            elif dealer_value > 21 or player_value > dealer_value:
-                winnings = player['bet'] * 2
-                player['funds'] += winnings  # Player wins
-                print(f"Player {i + 1} wins! They receive {winnings} (total funds: {player['funds']}).")
-            elif player_value == dealer_value:
-                player['funds'] += player['bet']  # Tie
-                print(f"Player {i + 1} ties with the dealer and gets their bet back (total funds: {player['funds']}).")
+                outcome = 'player_bust'
+            elif payout > player['bet']:
+                outcome = 'win'
+            elif payout:
+                outcome = 'tie'
             else:
-                print(f"Player {i + 1} loses their bet of {player['bet']} (total funds: {player['funds']}).")
-        end_time = time.time()  # End performance measurement
-        Game.execution_times['determine_winners'] += end_time - start_time  # Update execution time
+                outcome = 'loss'
+            self.output.emit(outcome, player=i + 1, bet=player['bet'], payout=payout, funds=player['funds'])
 
     def play_again(self):
         choice = self.get_valid_input("Do you want to play another round? (y/n): ", ['y', 'n', 'yes', 'no'])
         return choice in ['y', 'yes']  # Return True if player wants to play again
 
     def get_valid_input(self, prompt, valid_inputs):
+        self.output.flush()  # Show everything emitted so far before prompting
         while True:
             user_input = input(prompt).lower()
             if user_input in valid_inputs:
                 return user_input
             print(f"Invalid input. Please enter one of {valid_inputs}.")
 
+def settle_bet(player_value, dealer_value, bet):
+    # Return the amount paid back to a player: double the bet on a win, the bet on a tie, nothing on a loss
+    if player_value > 21:
+        return 0
+    if dealer_value > 21 or player_value > dealer_value:
+        return bet * 2
+    if player_value == dealer_value:
+        return bet
+    return 0
+
 def get_valid_integer_input(prompt, min_value, max_value):
     while True:
         try:
@@ -243,6 +389,7 @@ def main():
     players = get_valid_integer_input("How many players? (1-5): ", min_value=1, max_value=5)
     starting_funds = get_valid_integer_input("Enter starting funds for each player (max 1000): ", min_value=1, max_value=1000)
 
+    blackjack_metrics.enable()  # Time the interactive game so the metrics can be revealed at the end
     game = Game(players, starting_funds)
     game.start_game()
 
@@ -250,11 +397,7 @@ def main():
         reveal_metrics = input("Would you like to reveal execution time metrics? (y/n): ").lower()
         if reveal_metrics in ['y', 'yes']:
             print("\nExecution times for methods:")
-            for class_name, times in [("Card", Card.execution_times), ("Deck", Deck.execution_times),
-                                      ("Hand", Hand.execution_times), ("Game", Game.execution_times)]:
-                for method_name, exec_time in times.items():
-                    if exec_time > 0:
-                        print(f"{class_name} {method_name} execution time: {exec_time:.6f} seconds")
+            blackjack_metrics.print_report()
             break
         elif reveal_metrics in ['n', 'no']:
             print("Exiting the game.")
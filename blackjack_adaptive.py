@@ -0,0 +1,72 @@
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from blackjack_engine import HeadlessGame
+from blackjack_rules import ORIGINAL
+from blackjack_stats import Aggregate
+from blackjack_vectorized import simulate_batch, compile_policy
+
+# Why run_until stopped: the target was reached, the time budget ran out, or no more hands could be played
+CONVERGED, OUT_OF_TIME, HAND_LIMIT = 'converged', 'out of time', 'hand limit'
+
+AdaptiveResult = namedtuple('AdaptiveResult', ['stats', 'reason', 'elapsed', 'batches'])
+
+def vectorized_step(policy=17, decks=None, seed=None, rules=ORIGINAL):
+    # step(hands, stats) playing independent one-hand rounds with blackjack_vectorized
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    policy = compile_policy(policy)
+
+    def step(hands, stats):
+        stats.add_batch(simulate_batch(hands, policy, decks, rng, rules=rules))
+    return step
+
+def headless_step(players=1, seed=None, **options):
+    # step(hands, stats) carrying on one HeadlessGame session, so the shoe and cut card carry over between batches
+    game = HeadlessGame(players, 10 ** 12, seed=seed, **options)
+
+    def step(hands, stats):
+        for result in game.play_rounds(-(-hands // players)):
+            stats.add_round(result)
+    return step
+
+STEPS = {'vectorized': vectorized_step, 'headless': headless_step}
+
+def next_batch(stats, target_stderr, first_batch, max_batch):
+    # Hands still needed if the variance seen so far holds, with a little to spare
+    if stats.count < 2:
+        return first_batch
+    needed = stats.variance() / target_stderr ** 2 - stats.count
+    return int(min(max(needed * 1.1, first_batch), max_batch))
+
+def run_until(target_stderr, mode='vectorized', time_budget=None, max_hands=None, first_batch=10000, max_batch=1 << 22, **options):
+    # Play batches until the standard error of the mean net result is at most target_stderr, sizing
+    # each batch from the variance seen so far. time_budget (seconds) and max_hands stop it earlier.
+    if target_stderr <= 0:
+        raise ValueError("The target standard error must be positive.")
+    if mode not in STEPS:
+        raise ValueError(f"Unknown mode {mode!r}, expected one of {sorted(STEPS)}.")
+    step = STEPS[mode](**options)
+    stats = Aggregate()
+    start = time.perf_counter()
+    batches = 0
+    while True:
+        elapsed = time.perf_counter() - start
+        if stats.count >= first_batch and stats.stderr() <= target_stderr:
+            return AdaptiveResult(stats, CONVERGED, elapsed, batches)
+        hands = next_batch(stats, target_stderr, first_batch, max_batch)
+        if max_hands is not None:
+            if stats.count >= max_hands:
+                return AdaptiveResult(stats, HAND_LIMIT, elapsed, batches)
+            hands = min(hands, max_hands - stats.count)
+        if time_budget is not None and batches:
+            affordable = int((time_budget - elapsed) * stats.count / elapsed)  # At the speed seen so far
+            if affordable < 1:
+                return AdaptiveResult(stats, OUT_OF_TIME, elapsed, batches)
+            hands = min(hands, affordable)
+        counted = stats.count
+        step(hands, stats)
+        batches += 1
+        if stats.count == counted:
+            return AdaptiveResult(stats, HAND_LIMIT, time.perf_counter() - start, batches)  # Every player is out of funds
@@ -0,0 +1,129 @@
+import numpy as np
+
+from CardGameLocal_FINAL import DEALER_STAND_VALUE
+from blackjack_tables import Tables
+
+# Bankroll trajectories: every trajectory is one player at their own table with their own shoe,
+# betting from their funds until they are ruined (no funds left) or reach the target. Bet policies
+# are called with every trajectory's funds and the true count of its shoe (None unless the policy
+# has a counting system) and return the bets.
+
+class FlatBets: # The same stake every round
+
+    def __init__(self, units=1):
+        self.units = units
+
+    def __call__(self, funds, true_count):
+        return np.full_like(funds, self.units)
+
+class ProportionalBets: # A fixed share of the current bankroll, never below the minimum bet
+
+    def __init__(self, fraction, minimum=1):
+        self.fraction = fraction
+        self.minimum = minimum
+
+    def __call__(self, funds, true_count):
+        return np.maximum((funds * self.fraction).astype(np.int64), self.minimum)
+
+class CountBets: # A bet ramp: one unit at or below the threshold true count, one more per point above it
+
+    def __init__(self, unit=1, threshold=1, max_units=8, counting='hi-lo'):
+        self.unit = unit
+        self.threshold = threshold
+        self.max_units = max_units
+        self.counting = counting  # Count system the shoes keep, see CardGameLocal_FINAL.COUNT_SYSTEMS
+
+    def __call__(self, funds, true_count):
+        units = np.clip(np.floor(true_count) - self.threshold + 1, 1, self.max_units)
+        return units.astype(np.int64) * self.unit
+
+class RuinReport: # What happened to every trajectory
+
+    def __init__(self, bankroll, target, final_funds, ruined_at, target_at, max_drawdown, rounds):
+        self.bankroll = bankroll
+        self.target = target
+        self.final_funds = final_funds
+        self.ruined_at = ruined_at  # Round in which each trajectory was ruined, -1 if it never was
+        self.target_at = target_at  # Round in which each trajectory reached the target, -1 if it never did
+        self.max_drawdown = max_drawdown  # Largest fall from a bankroll high to a later low
+        self.rounds = rounds
+
+    def __len__(self):
+        return len(self.final_funds)
+
+    def risk_of_ruin(self):
+        return float((self.ruined_at >= 0).mean())
+
+    def target_chance(self):
+        return float((self.target_at >= 0).mean())
+
+    def unfinished(self):
+        # Share still playing when the round limit was reached
+        return float(((self.ruined_at < 0) & (self.target_at < 0)).mean())
+
+    def ruin_times(self):
+        return self.ruined_at[self.ruined_at >= 0]
+
+    def ruin_time_percentiles(self, percentiles=(10, 50, 90)):
+        times = self.ruin_times()
+        return dict(zip(percentiles, np.percentile(times, percentiles).tolist())) if times.size else {}
+
+    def drawdown_percentiles(self, percentiles=(50, 90, 99)):
+        return dict(zip(percentiles, np.percentile(self.max_drawdown, percentiles).tolist()))
+
+class Bankrolls(Tables): # Many bankroll trajectories played in lockstep until ruin or target
+
+    def __init__(self, trajectories, bankroll, target=None, bet=FlatBets(), policy=DEALER_STAND_VALUE, decks=6,
+                 penetration=0.75, seed=None, compact_below=0.5):
+        super().__init__(trajectories, 1, bankroll, policy, bet, decks, penetration, seed, getattr(bet, 'counting', None))
+        self.bankroll = bankroll
+        self.target = target
+        self.limit = target if target is not None else np.iinfo(np.int64).max  # No target plays until ruin
+        self.compact_below = compact_below  # Drop finished trajectories from the arrays once fewer than this share play on
+        self.ids = np.arange(trajectories)  # Trajectory of each remaining row
+        self.final_funds = np.full(trajectories, bankroll, dtype=np.int64)
+        self.ruined_at = np.full(trajectories, -1, dtype=np.int64)
+        self.target_at = np.full(trajectories, -1, dtype=np.int64)
+        self.peaks = np.full(trajectories, bankroll, dtype=np.int64)
+        self.max_drawdown = np.zeros(trajectories, dtype=np.int64)
+
+    @property
+    def active(self):
+        funds = self.funds
+        return (funds > 0) & (funds < self.limit)
+
+    def collect_bets(self, active):
+        true_count = self.true_count() if self.counts is not None else None
+        bets = self.bet(self.funds[:, 0], true_count)[:, None]
+        self.bets = np.where(active, np.clip(bets, 1, self.funds), 0)
+        self.funds -= self.bets
+
+    def play_round(self):
+        result = super().play_round()
+        if result is None:
+            return None
+        funds, ids = self.funds[:, 0], self.ids
+        self.final_funds[ids] = funds
+        self.peaks[ids] = peaks = np.maximum(self.peaks[ids], funds)
+        self.max_drawdown[ids] = np.maximum(self.max_drawdown[ids], peaks - funds)
+        ruined = ids[(funds == 0) & (self.ruined_at[ids] < 0)]
+        self.ruined_at[ruined] = self.rounds_played
+        reached = ids[(funds >= self.limit) & (self.target_at[ids] < 0)]
+        self.target_at[reached] = self.rounds_played
+
+        playing = self.active[:, 0]
+        if playing.mean() < self.compact_below:
+            rows = np.flatnonzero(playing)
+            self.select(rows)
+            self.ids = ids[rows]
+        return result
+
+    def run(self, max_rounds=10 ** 6):
+        # Play until every trajectory is ruined or has reached the target, or max_rounds have been played
+        for _ in self.play_rounds(max_rounds):
+            pass
+        return RuinReport(self.bankroll, self.target, self.final_funds, self.ruined_at, self.target_at,
+                          self.max_drawdown, self.rounds_played)
+
+def risk_of_ruin(trajectories, bankroll, target=None, max_rounds=10 ** 6, **options):
+    return Bankrolls(trajectories, bankroll, target, **options).run(max_rounds)
@@ -0,0 +1,247 @@
+import json
+import os
+import struct
+import zlib
+from array import array
+
+from CardGameLocal_FINAL import Hand, Shoe, card_from_code
+from blackjack_rules import ORIGINAL
+from blackjack_shuffle import BufferedShuffler, SeededShuffler, NumpyShuffler, TYPECODE, shared_shuffler
+from blackjack_stats import RunningStats, Aggregate, TOTALS
+
+# Checkpoint file: a 16-byte header (magic, format version) followed by entries. Each entry is its
+# body length and CRC-32, then tagged sections (4-byte tag, payload length, payload). The first entry
+# holds every section; later entries only hold the sections that changed since the previous one, so a
+# checkpoint between rounds is usually a few dozen bytes: the shoe position, the players and the
+# aggregates. Loading keeps the newest copy of each section and ignores a torn last entry, which is
+# what a process killed in the middle of a write leaves behind.
+
+MAGIC = b'BJCK'
+VERSION = 1
+
+HEADER = struct.Struct('<4sH10x')
+ENTRY = struct.Struct('<II')  # Body length, CRC-32 of the body
+SECTION = struct.Struct('<4sI')  # Tag, payload length
+
+SHOE = struct.Struct('<HI13b')  # Decks, cut card position, count tag of each rank; card codes follow
+POSITION = struct.Struct('<I')  # Cards dealt since the last shuffle
+PLAYER = struct.Struct('<HqqB')  # Seat, funds, bet, number of cards; card codes follow
+GAME = struct.Struct('<QQ')  # Rounds played, session seed
+STATS = struct.Struct('<qdd4q')  # RunningStats count, mean, m2 and outcome counts
+AGGREGATE = struct.Struct(f'<4q{TOTALS}q{TOTALS}q')  # Aggregate bankroll path summary and both histograms
+SEEDED = struct.Struct('<QQ?')  # Next seed, seed of the current order, whether there is a current order
+TWISTER = struct.Struct('<B625I?d')  # random.Random.getstate(): version, Mersenne Twister words, pending gauss
+
+SHUFFLER_KINDS = {SeededShuffler: b'S', BufferedShuffler: b'B', NumpyShuffler: b'N'}
+
+def hand_bytes(hand):
+    return bytes([card.code for card in hand.cards])
+
+def load_hand(codes, hand_class=Hand):
+    # Dealing the same cards again rebuilds the value, Aces and state exactly
+    hand = hand_class()
+    for code in codes:
+        hand.add_card(card_from_code(code))
+    return hand
+
+def shoe_section(deck):
+    cut = getattr(deck, 'cut', 0)  # A plain Deck has no cut card and only holds the cards still to deal
+    return SHOE.pack(deck.decks, cut, *deck.count_tags) + bytes([card.code for card in deck.cards])
+
+def shuffler_section(shuffler):
+    if shuffler is shared_shuffler:
+        # Restoring it would reseed the random module and swap out words every other shoe is drawing from
+        raise ValueError("A shoe using the shared shuffler cannot be checkpointed; give it a generator of its own.")
+    kind = SHUFFLER_KINDS.get(type(shuffler))
+    if kind == b'S':
+        last = shuffler.last_seed
+        return kind + SEEDED.pack(shuffler.seed, last or 0, last is not None)
+    if kind == b'B':
+        try:
+            version, words, gauss = shuffler.rng.getstate()
+        except (AttributeError, NotImplementedError):
+            raise ValueError("The shuffler's generator has no state that can be saved.")
+        unused = array(TYPECODE, shuffler.words[shuffler.index:]).tobytes()  # Words drawn but not used yet
+        return kind + TWISTER.pack(version, *words, gauss is not None, gauss or 0.0) + unused
+    if kind == b'N':
+        return kind + json.dumps(shuffler.rng.bit_generator.state).encode()
+    raise ValueError(f"{type(shuffler).__name__} cannot be checkpointed.")
+
+def players_section(players):
+    data = bytearray(struct.pack('<H', len(players)))
+    for index, player in enumerate(players):
+        cards = hand_bytes(player['hand'])
+        data += PLAYER.pack(player.get('seat', index), player['funds'], player['bet'], len(cards)) + cards
+    return bytes(data)
+
+def stats_section(stats):
+    outcomes = list(stats.outcomes.values())
+    return STATS.pack(stats.count, stats.mean, stats.m2, *outcomes)
+
+def whole(amount):
+    if amount != int(amount):
+        raise ValueError(f"Checkpoints hold whole amounts only, not {amount}.")
+    return int(amount)
+
+def game_sections(game, stats=None):
+    # Everything needed to carry on a Game or HeadlessGame between rounds, keyed by section tag
+    if getattr(game, 'rules', ORIGINAL).fractional_payouts:
+        raise ValueError("Checkpoints hold whole amounts only; these rules can pay fractions of a unit.")
+    sections = {
+        b'SHOE': shoe_section(game.deck),
+        b'POSN': POSITION.pack(getattr(game.deck, 'dealt', 0)),
+        b'RAND': shuffler_section(game.deck.shuffler),
+        b'PLAY': players_section(game.players),
+        b'DEAL': hand_bytes(game.dealer),
+        b'GAME': GAME.pack(getattr(game, 'rounds_played', 0), getattr(game, 'seed', 0) or 0),
+    }
+    if stats is not None:
+        sections[b'STAT'] = stats_section(stats)
+    if isinstance(stats, Aggregate):
+        sections[b'AGGR'] = AGGREGATE.pack(*map(whole, (stats.total, stats.peak, stats.low, stats.max_drawdown)),
+                                           *stats.player_totals, *stats.dealer_totals)
+    return sections
+
+def restore_shuffler(shuffler, data):
+    kind, data = data[:1], data[1:]
+    if SHUFFLER_KINDS.get(type(shuffler)) != kind:
+        raise ValueError(f"The checkpoint was taken with a different shuffler than {type(shuffler).__name__}.")
+    if kind == b'S':
+        shuffler.seed, last, has_last = SEEDED.unpack(data)
+        shuffler.last_seed = last if has_last else None
+    elif kind == b'B':
+        version, *words = TWISTER.unpack_from(data)
+        gauss, has_gauss = words.pop(), words.pop()
+        shuffler.rng.setstate((version, tuple(words), gauss if has_gauss else None))
+        shuffler.words = array(TYPECODE)
+        shuffler.words.frombytes(data[TWISTER.size:])
+        shuffler.index = 0
+    else:
+        shuffler.rng.bit_generator.state = json.loads(data)
+
+def restore_game(game, sections, stats=None):
+    # Load saved state into a game built with the same settings (strategies and callbacks are not saved)
+    deck = game.deck
+    decks, cut, *tags = SHOE.unpack_from(sections[b'SHOE'])
+    deck.decks, deck.count_tags = decks, tuple(tags)
+    deck.cards = [card_from_code(code) for code in sections[b'SHOE'][SHOE.size:]]
+    if isinstance(deck, Shoe):
+        deck.cut = cut
+        deck.dealt, = POSITION.unpack(sections[b'POSN'])
+    deck.recount()
+    restore_shuffler(deck.shuffler, sections[b'RAND'])
+
+    hand_class = getattr(game, 'hand_class', Hand)
+    data = sections[b'PLAY']
+    count, = struct.unpack_from('<H', data)
+    offset = 2
+    game.players = []
+    for _ in range(count):
+        seat, funds, bet, cards = PLAYER.unpack_from(data, offset)
+        offset += PLAYER.size
+        hand = load_hand(data[offset:offset + cards], hand_class)
+        offset += cards
+        game.players.append({'seat': seat, 'hand': hand, 'funds': funds, 'bet': bet})
+    game.dealer = load_hand(sections[b'DEAL'], hand_class)
+
+    rounds_played, seed = GAME.unpack(sections[b'GAME'])
+    if hasattr(game, 'rounds_played'):
+        game.rounds_played, game.seed = rounds_played, seed
+    if stats is not None and b'STAT' in sections:
+        stats.count, stats.mean, stats.m2, *outcomes = STATS.unpack(sections[b'STAT'])
+        stats.outcomes = dict(zip(RunningStats().outcomes, outcomes))
+    if isinstance(stats, Aggregate) and b'AGGR' in sections:
+        stats.total, stats.peak, stats.low, stats.max_drawdown, *totals = AGGREGATE.unpack(sections[b'AGGR'])
+        stats.player_totals, stats.dealer_totals = totals[:TOTALS], totals[TOTALS:]
+    return game
+
+def pack_entry(sections):
+    body = b''.join(SECTION.pack(tag, len(payload)) + payload for tag, payload in sections.items())
+    return ENTRY.pack(len(body), zlib.crc32(body)) + body
+
+def read_checkpoint(path):
+    # Newest copy of every section; an incomplete or corrupt entry ends the file
+    with open(path, 'rb') as file:
+        data = file.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a checkpoint.")
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a checkpoint.")
+    if version != VERSION:
+        raise ValueError(f"{path} uses checkpoint format version {version}, expected {VERSION}.")
+    sections = {}
+    offset = HEADER.size
+    while offset + ENTRY.size <= len(data):
+        length, crc = ENTRY.unpack_from(data, offset)
+        body = data[offset + ENTRY.size:offset + ENTRY.size + length]
+        if len(body) != length or zlib.crc32(body) != crc:
+            break
+        position = 0
+        while position < length:
+            tag, size = SECTION.unpack_from(body, position)
+            position += SECTION.size
+            sections[tag] = body[position:position + size]
+            position += size
+        offset += ENTRY.size + length
+    if not sections:
+        raise ValueError(f"{path} holds no complete checkpoint.")
+    return sections
+
+class Checkpointer: # Saves a game to one file, appending only what changed and compacting now and then
+
+    def __init__(self, path, compact_every=1000, sync=False):
+        self.path = path
+        self.compact_every = compact_every  # Rewrite the file as a single full entry after this many entries
+        self.sync = sync  # fsync after every checkpoint; safer against power loss, much slower
+        self.saved = {}  # Sections as they are on disk
+        self.entries = 0
+        self.file = None
+
+    def save(self, game, stats=None):
+        sections = game_sections(game, stats)
+        if self.file is None or self.entries >= self.compact_every:
+            self.rewrite(sections)
+            return
+        changed = {tag: payload for tag, payload in sections.items() if self.saved.get(tag) != payload}
+        if changed:
+            self.file.write(pack_entry(changed))
+            self.finish_write(self.file)
+            self.saved.update(changed)
+            self.entries += 1
+
+    def rewrite(self, sections):
+        # Write a full snapshot next to the old file and swap it in, so there is always a complete checkpoint
+        if self.file is not None:
+            self.file.close()
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, VERSION) + pack_entry(sections))
+            self.finish_write(file)
+        os.replace(temporary, self.path)
+        self.file = open(self.path, 'ab')
+        self.saved = dict(sections)
+        self.entries = 1
+
+    def finish_write(self, file):
+        file.flush()
+        if self.sync:
+            os.fsync(file.fileno())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def resume(path, game, stats=None):
+    # Restore the game from a checkpoint if one exists; returns whether anything was loaded
+    if not os.path.exists(path):
+        return False
+    restore_game(game, read_checkpoint(path), stats)
+    return True
@@ -0,0 +1,75 @@
+import numpy as np
+
+from blackjack_shuffle import shoe_tops
+from blackjack_stats import RunningStats, summarise
+from blackjack_vectorized import play_decks, compile_policy
+
+# Common random numbers: both strategies play every round from the very same shuffled shoe, so luck
+# that affects both equally cancels out of the difference between them. With antithetic shoes each
+# shoe is also played with every card's rank mirrored (2 and Ace, 3 and King, ... 8 and 8) in the same
+# positions, so small cards become big ones; the pair counts as one observation.
+
+# No round with one player can use more cards: the player's cards add up to at most 30 and the
+# dealer's to at most 26 with Aces counted as 1, so only this much of each shoe is ever shuffled
+ROUND_CARDS = 56
+# Card code of the mirrored rank for every card code: same suit, rank 12 - rank. Every rank keeps its
+# count, so a mirrored shuffled shoe is still a uniformly shuffled shoe
+MIRROR = np.array([suit * 13 + 12 - rank for suit in range(4) for rank in range(13)], dtype=np.uint8)
+
+class Comparison: # Paired results of two strategies over the same shoes
+
+    def __init__(self):
+        self.first = RunningStats()
+        self.second = RunningStats()
+        self.difference = RunningStats()  # First minus second, one entry per shoe (or antithetic pair)
+
+    def add(self, first, second):
+        # Net results of both strategies, entry i of each from the same shoe
+        self.first.merge(summarise(first))
+        self.second.merge(summarise(second))
+        self.difference.merge(summarise(first.astype(np.float64) - second))
+
+    def merge(self, other):
+        self.first.merge(other.first)
+        self.second.merge(other.second)
+        self.difference.merge(other.difference)
+        return self
+
+    def interval(self, confidence=0.95):
+        return self.difference.interval(confidence)
+
+    def variance_reduction(self):
+        # How many times more rounds two independent simulations would need for the same precision
+        paired = self.difference.variance()
+        return (self.first.variance() + self.second.variance()) / paired if paired else float('inf')
+
+    def __repr__(self):
+        low, high = self.interval()
+        return f"Comparison(rounds={self.first.count}, difference={self.difference.mean:.6f}, 95% CI=({low:.6f}, {high:.6f}))"
+
+def compare(first, second, rounds, decks=1, seed=None, antithetic=False, chunk_size=65536):
+    # Play two strategies (hit thresholds or anything compile_strategy takes) on the same shoes and compare them
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    first, second = compile_policy(first), compile_policy(second)  # Once, rather than for every chunk
+    comparison = Comparison()
+    for start in range(0, rounds, chunk_size):
+        codes = shoe_tops(min(chunk_size, rounds - start), decks, ROUND_CARDS, rng)
+        first_net = play_decks(codes, first).net
+        second_net = play_decks(codes, second).net
+        if antithetic:
+            mirrored = MIRROR[codes]
+            first_net = (first_net + play_decks(mirrored, first).net) / 2
+            second_net = (second_net + play_decks(mirrored, second).net) / 2
+        comparison.add(first_net, second_net)
+    return comparison
+
+def compare_many(strategies, rounds, decks=1, seed=None, chunk_size=65536):
+    # Results of many strategies (anything compile_strategy takes) played on the same shoes, in the given order
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    tables = [compile_policy(strategy) for strategy in strategies]  # Compiled once, then every decision is a lookup
+    results = [RunningStats() for _ in tables]
+    for start in range(0, rounds, chunk_size):
+        codes = shoe_tops(min(chunk_size, rounds - start), decks, ROUND_CARDS, rng)
+        for table, stats in zip(tables, results):
+            stats.merge(summarise(play_decks(codes, table).net))
+    return results
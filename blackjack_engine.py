@@ -0,0 +1,241 @@
+import random
+from collections import namedtuple
+from operator import attrgetter
+
+from CardGameLocal_FINAL import Shoe, FastHand, DEALER_STAND_VALUE, settle_bet
+from blackjack_rules import ORIGINAL, is_natural
+from blackjack_shuffle import SeededShuffler
+from blackjack_strategy import compile_strategy
+
+WIN, TIE, LOSS, BUST = 'win', 'tie', 'loss', 'bust'  # Possible outcomes for a seat at the end of a round
+
+# One player's part of a round. actions has bit i set when decision i was a hit; decisions counts them
+SeatResult = namedtuple('SeatResult', ['seat', 'bet', 'value', 'payout', 'net', 'outcome', 'cards', 'actions', 'decisions'])
+# Everything that happened in one round. seed and position locate the first card dealt: the seed of the
+# shoe's current shuffle and how many cards had already been dealt from it
+RoundResult = namedtuple('RoundResult', ['number', 'dealer_value', 'seats', 'seed', 'position', 'dealer_cards'])
+
+class ThresholdStrategy: # Hits below a fixed hand value and stands otherwise
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+
+    def __call__(self, value, soft, dealer_upcard):
+        return value < self.threshold
+
+class FlatBet: # Always stakes the same amount
+
+    def __init__(self, amount):
+        self.amount = amount
+
+    def __call__(self, seat, funds):
+        return self.amount
+
+# Strategies are small classes rather than closures so they can be sent to worker processes
+def stand_on(threshold):
+    return ThresholdStrategy(threshold)
+
+def flat_bet(amount):
+    return FlatBet(amount)
+
+mimic_dealer = stand_on(DEALER_STAND_VALUE)  # Play the hand exactly like the dealer does
+
+def hand_state(hand):
+    # State of a Hand as FastHand keeps it, for indexing strategy and dealer tables
+    return hand.value | (hand.aces > 0) << 5
+
+def outcome_for(player_value, payout, bet):
+    # Classify a settled hand using the same order of checks as Game.determine_winners
+    if player_value > 21:
+        return BUST
+    if payout > bet:
+        return WIN
+    if payout:
+        return TIE
+    return LOSS
+
+class HeadlessGame: # Plays rounds of Blackjack with callbacks instead of input() and print()
+
+    def __init__(self, players, starting_funds, strategy=mimic_dealer, bet_strategy=flat_bet(1), seed=None, decks=None, penetration=0.75,
+                 hand_class=FastHand, recorder=None, rules=ORIGINAL):
+        if recorder is not None and (rules.extended or rules.dealer_hits_soft_17):
+            # Hand logs and blackjack_replay follow the original rules: one hand per seat, settle_bet, dealer stands
+            # on 17. The deck count is the only rule that may differ, since the log records it
+            raise ValueError("Hand histories can only be recorded under the original rules.")
+        self.seed = seed if seed is not None else random.getrandbits(64)  # Kept so the session can be replayed
+        self.strategy = strategy  # strategy(value, soft, dealer_upcard) -> True to hit, or anything compile_strategy takes
+        self.table = compile_strategy(strategy)  # Asked once per hand and upcard here, so each decision is one lookup
+        self.hits = self.table.hits
+        self.rules = rules  # See blackjack_rules; decks defaults to the rules' deck count
+        self.hand_state = attrgetter('state') if hand_class is FastHand else hand_state  # FastHand already keeps its state
+        self.bet_strategy = bet_strategy  # bet_strategy(seat, funds) -> amount to bet
+        self.hand_class = hand_class  # FastHand by default; Hand gives identical results
+        self.players = [{'seat': seat, 'hand': hand_class(), 'funds': starting_funds, 'bet': 0} for seat in range(players)]
+        self.dealer = hand_class()
+        self.deck = Shoe(decks if decks is not None else rules.decks, penetration, shuffler=SeededShuffler(self.seed))
+        if getattr(recorder, 'decks', self.deck.decks) != self.deck.decks:
+            raise ValueError(f"The hand log is for a {recorder.decks}-deck shoe but this game deals from {self.deck.decks}.")
+        self.rounds_played = 0
+        self.recorder = recorder  # Optional hand-history writer, see blackjack_log
+
+        # The steps of a round are picked once for the rules, so the original rules play the plain loops
+        # below and no rule flag is tested while a round is played
+        if rules.dealer_hits_soft_17:
+            self.dealer_turn = self.dealer_turn_by_table
+        if rules.extended:
+            self.player_turn = self.player_turn_with_options
+            self.determine_winners = self.determine_winners_with_options
+
+    def collect_bets(self):
+        for player in self.players:
+            bet = self.bet_strategy(player['seat'], player['funds'])
+            # Same limits get_valid_integer_input enforces, so bets are always whole units. A fraction of a unit
+            # won under fractional payouts stays in funds but is never staked, and a seat left with less than
+            # one unit leaves the table holding it
+            bet = max(1, min(int(bet), int(player['funds'])))
+            player['bet'] = bet
+            player['funds'] -= bet
+
+    def initial_deal(self):
+        for player in self.players:
+            player['hand'] = self.hand_class()
+            player['hand'].add_card(self.deck.deal())
+            player['hand'].add_card(self.deck.deal())
+        self.dealer = self.hand_class()
+        self.dealer.add_card(self.deck.deal())
+        self.dealer.add_card(self.deck.deal())
+
+    def player_turn(self, player, dealer_upcard):
+        hand = player['hand']
+        actions = decisions = 0
+        # A hand on 21 stands automatically and a bust ends the turn, just like Game.player_turn
+        hits, hand_state = self.hits, self.hand_state
+        while hand.value < 21:
+            if not hits[hand_state(hand) * 12 + dealer_upcard]:
+                decisions += 1
+                break
+            actions |= 1 << decisions
+            decisions += 1
+            hand.add_card(self.deck.deal())
+        player['actions'], player['decisions'] = actions, decisions
+
+    def play_hand(self, player, entry, dealer_upcard):
+        # One hand of a seat under rules with options: double on the first two cards or play like player_turn
+        hand = entry['hand']
+        hits = self.hits
+        if self.rules.double and hand.value < 21 and self.table.doubles[self.hand_state(hand) * 12 + dealer_upcard] \
+                and player['funds'] >= entry['bet']:
+            player['funds'] -= entry['bet']
+            entry['bet'] *= 2
+            hand.add_card(self.deck.deal())
+            entry['actions'], entry['decisions'] = 1, 1
+            return
+        actions = decisions = 0
+        while hand.value < 21:
+            if not hits[self.hand_state(hand) * 12 + dealer_upcard]:
+                decisions += 1
+                break
+            actions |= 1 << decisions
+            decisions += 1
+            hand.add_card(self.deck.deal())
+        entry['actions'], entry['decisions'] = actions, decisions
+
+    def player_turn_with_options(self, player, dealer_upcard):
+        # player_turn for rules with naturals, doubling, splitting or surrender. Every hand the seat ends
+        # up with goes in player['hands'] with its own stake; a doubled hand records a single hit
+        rules, table = self.rules, self.table
+        hand, bet = player['hand'], player['bet']
+        natural = rules.naturals and is_natural(hand)
+        entry = {'hand': hand, 'bet': bet, 'natural': natural, 'surrendered': False, 'actions': 0, 'decisions': 0}
+        player['hands'] = [entry]
+        if natural or (rules.naturals and is_natural(self.dealer)):
+            return  # Settled as they are: the dealer checks for a natural before anyone plays
+        if rules.surrender and table.surrenders[self.hand_state(hand) * 12 + dealer_upcard]:
+            entry['surrendered'], entry['decisions'] = True, 1
+            return
+        first, second = hand.cards
+        pair = first.points
+        if rules.split and pair == second.points and table.splits[pair * 12 + dealer_upcard] and player['funds'] >= bet:
+            player['funds'] -= bet
+            player['hands'] = []
+            for card in (first, second):
+                split_hand = self.hand_class()
+                split_hand.add_card(card)
+                split_hand.add_card(self.deck.deal())
+                split_entry = dict(entry, hand=split_hand)
+                player['hands'].append(split_entry)
+                if pair != 11:  # Split Aces get one card each and no choices
+                    self.play_hand(player, split_entry, dealer_upcard)
+            return
+        self.play_hand(player, entry, dealer_upcard)
+
+    def dealer_turn(self):
+        while self.dealer.value < DEALER_STAND_VALUE:
+            self.dealer.add_card(self.deck.deal())
+
+    def dealer_turn_by_table(self):
+        # dealer_turn for rules where the dealer's decision is not just their total, such as hitting soft 17
+        dealer_hits = self.rules.dealer_hits
+        while dealer_hits[self.hand_state(self.dealer)]:
+            self.dealer.add_card(self.deck.deal())
+
+    def determine_winners(self):
+        dealer_value = self.dealer.value
+        seats = []
+        for player in self.players:
+            value = player['hand'].value
+            bet = player['bet']
+            payout = settle_bet(value, dealer_value, bet)
+            player['funds'] += payout
+            seats.append(SeatResult(player['seat'], bet, value, payout, payout - bet, outcome_for(value, payout, bet),
+                                    tuple(player['hand'].cards), player['actions'], player['decisions']))
+        return seats
+
+    def determine_winners_with_options(self):
+        # One SeatResult per hand, so a seat that split has two with the same seat number
+        rules = self.rules
+        dealer_value = self.dealer.value
+        dealer_natural = rules.naturals and is_natural(self.dealer)
+        seats = []
+        for player in self.players:
+            for entry in player['hands']:
+                hand, bet = entry['hand'], entry['bet']
+                value = hand.value
+                payout = rules.settle(value, dealer_value, bet, entry['natural'], dealer_natural, entry['surrendered'])
+                player['funds'] += payout
+                outcome = LOSS if entry['surrendered'] else outcome_for(value, payout, bet)
+                seats.append(SeatResult(player['seat'], bet, value, payout, payout - bet, outcome,
+                                        tuple(hand.cards), entry['actions'], entry['decisions']))
+        return seats
+
+    def play_round(self):
+        self.players = [player for player in self.players if player['funds'] >= 1]  # Remove players who cannot make the minimum bet
+        if not self.players:
+            return None
+        self.deck.check_cut_card()
+        seed, position = self.deck.shuffler.last_seed, self.deck.dealt
+
+        self.collect_bets()
+        self.initial_deal()
+        dealer_upcard = self.dealer.cards[0].points
+        for player in self.players:
+            self.player_turn(player, dealer_upcard)
+        self.dealer_turn()
+
+        self.rounds_played += 1
+        result = RoundResult(self.rounds_played, self.dealer.value, tuple(self.determine_winners()), seed, position, tuple(self.dealer.cards))
+        if self.recorder is not None:
+            self.recorder.record(result)
+        return result
+
+    def play_rounds(self, rounds):
+        # Yield one RoundResult per round until the count is reached or every player is out of funds
+        for _ in range(rounds):
+            result = self.play_round()
+            if result is None:
+                return
+            yield result
+
+def simulate(rounds, players=1, starting_funds=10 ** 9, **options):
+    # Play a whole session and return the list of round results
+    return list(HeadlessGame(players, starting_funds, **options).play_rounds(rounds))
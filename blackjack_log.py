@@ -0,0 +1,110 @@
+import os
+import struct
+
+# Append-only hand-history log. The file starts with a 16-byte header (magic, format version, record
+# size, decks in the shoe) followed by fixed-width little-endian records, one per seat per round, so record i always
+# starts at HEADER.size + i * RECORD.size and the file can be memory-mapped as a NumPy array.
+
+MAGIC = b'BJHL'
+VERSION = 2  # Version 1 headers did not record the deck count
+MAX_CARDS = 16  # Card slots per hand; unused slots hold NO_CARD
+NO_CARD = 255
+NO_CARD_BYTE = bytes([NO_CARD])
+
+HEADER = struct.Struct('<4sHHH6x')
+RECORD = struct.Struct(f'<QQHBB{MAX_CARDS}sB{MAX_CARDS}sHBIIBB6x')
+
+RECORD_FIELDS = [
+    ('round', '<u8'),  # Round number within the session
+    ('seed', '<u8'),  # Seed of the shoe's shuffle when the round started
+    ('position', '<u2'),  # Cards already dealt from that shuffle
+    ('seat', 'u1'),
+    ('player_count', 'u1'),
+    ('player_cards', 'u1', (MAX_CARDS,)),  # Card codes (Card.code) in the order they were dealt
+    ('dealer_count', 'u1'),
+    ('dealer_cards', 'u1', (MAX_CARDS,)),
+    ('actions', '<u2'),  # Bit i set when decision i was a hit
+    ('decisions', 'u1'),
+    ('bet', '<u4'),
+    ('payout', '<u4'),  # Amount returned by settle_bet
+    ('player_value', 'u1'),
+    ('dealer_value', 'u1'),
+    ('reserved', 'u1', (6,)),
+]
+
+def record_dtype():
+    import numpy as np
+    dtype = np.dtype(RECORD_FIELDS)
+    assert dtype.itemsize == RECORD.size
+    return dtype
+
+def pack_cards(cards):
+    if len(cards) > MAX_CARDS:
+        raise ValueError(f"A hand of {len(cards)} cards does not fit in the log format (max {MAX_CARDS}).")
+    return bytes([card.code for card in cards]).ljust(MAX_CARDS, NO_CARD_BYTE)
+
+class HandLogWriter: # Buffers packed records in memory and appends them to the log in large writes
+
+    def __init__(self, path, decks=1, buffer_size=1 << 20):
+        self.path = path
+        self.decks = decks  # Decks in the shoe of the games recorded, which replaying them needs
+        self.buffer_size = buffer_size
+        self.buffer = bytearray()
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, 'wb') as file:
+                file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, decks))
+        elif check_header(path) != decks:
+            raise ValueError(f"{path} records games dealt from a different number of decks than {decks}.")
+        self.file = open(path, 'ab')
+
+    def record(self, result):
+        # Add every seat of a blackjack_engine.RoundResult; usable as HeadlessGame's recorder
+        dealer_cards = pack_cards(result.dealer_cards)
+        for seat in result.seats:
+            self.buffer += RECORD.pack(result.number, result.seed, result.position, seat.seat,
+                                       len(seat.cards), pack_cards(seat.cards), len(result.dealer_cards), dealer_cards,
+                                       seat.actions, seat.decisions, seat.bet, seat.payout, seat.value, result.dealer_value)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def check_header(path):
+    # Returns the number of decks the logged games were dealt from
+    with open(path, 'rb') as file:
+        magic, version, record_size, decks = HEADER.unpack(file.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a hand-history log.")
+    if version != VERSION or record_size != RECORD.size:
+        raise ValueError(f"{path} uses log format version {version}, expected {VERSION}.")
+    return decks
+
+def read_log(path):
+    # Memory-map the records as a NumPy structured array; pages are only read when they are touched
+    import numpy as np
+    check_header(path)
+    count = (os.path.getsize(path) - HEADER.size) // RECORD.size
+    if not count:
+        return np.zeros(0, dtype=record_dtype())
+    return np.memmap(path, dtype=record_dtype(), mode='r', offset=HEADER.size, shape=(count,))
+
+def iter_chunks(path, size=1 << 20):
+    # Walk a log of any size in fixed-size slices of the memory map
+    records = read_log(path)
+    for start in range(0, len(records), size):
+        yield records[start:start + size]
@@ -0,0 +1,71 @@
+import os
+import time
+from functools import wraps
+
+# Registered methods are left untouched until enable() is called, so instrumentation
+# that is switched off costs nothing at all. When on, each call is timed with the
+# monotonic perf_counter clock and counted.
+
+registered = []  # (class, method name, original function)
+calls = {}  # 'Class.method' -> number of calls
+totals = {}  # 'Class.method' -> total seconds spent in the method
+enabled = False
+
+def instrument(*names):
+    # Class decorator registering the named methods for timing
+    def register(cls):
+        for name in names:
+            registered.append((cls, name, cls.__dict__[name]))
+            if enabled:
+                setattr(cls, name, timed(cls.__dict__[name], f"{cls.__name__}.{name}"))
+        return cls
+    return register
+
+def timed(function, key):
+    calls.setdefault(key, 0)
+    totals.setdefault(key, 0.0)
+    clock = time.perf_counter
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            totals[key] += clock() - start
+            calls[key] += 1
+    return wrapper
+
+def enable():
+    global enabled
+    if not enabled:
+        for cls, name, function in registered:
+            setattr(cls, name, timed(function, f"{cls.__name__}.{name}"))
+        enabled = True
+
+def disable():
+    global enabled
+    for cls, name, function in registered:
+        setattr(cls, name, function)  # Put the original, untimed method back
+    enabled = False
+
+def reset():
+    for key in calls:
+        calls[key] = 0
+        totals[key] = 0.0
+
+def report():
+    # Return (method, calls, total seconds, average seconds per call) for every method that ran
+    return [(key, calls[key], totals[key], totals[key] / calls[key]) for key in calls if calls[key]]
+
+def print_report():
+    rows = report()
+    if not rows:
+        print("No execution metrics were recorded.")
+        return
+    print(f"{'Method':<26}{'Calls':>12}{'Total (s)':>14}{'Per call (us)':>16}")
+    for key, count, total, average in sorted(rows, key=lambda row: row[2], reverse=True):
+        print(f"{key:<26}{count:>12}{total:>14.6f}{average * 1e6:>16.3f}")
+
+if os.environ.get('BLACKJACK_METRICS', '').lower() in ('1', 'true', 'yes'):
+    enabled = True  # Methods registered from now on are timed as soon as their class is defined
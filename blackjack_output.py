@@ -0,0 +1,105 @@
+import sys
+from collections import namedtuple
+
+# Game sends events (a name plus fields) to an output sink instead of printing. Fields hold the
+# objects themselves, such as a Hand, so the text for an event is only built by sinks that show it;
+# RecordingSink keeps a snapshot of each hand instead, since the Hand goes on changing.
+
+MESSAGES = {
+    'start': "Starting a game of Blackjack!",
+    'game_over': "No players have enough funds to continue. Game over.",
+    'reshuffle': "The cut card has come out. Reshuffling the shoe.",
+    'player_turn': "\nPlayer {player}'s turn:",
+    'hand': "{hand}",
+    'blackjack': "Blackjack!",
+    'bust': "You bust with {value}!",
+    'dealer_turn': "\nDealer's turn:",
+    'dealer_bust': "Dealer busts!",
+    'dealer_hand': "\nDealer's final hand: {hand}",
+    'player_bust': "Player {player} busts and loses their bet of {bet} (Total funds: {funds})",
+    'win': "Player {player} wins! They receive {payout} (total funds: {funds}).",
+    'tie': "Player {player} ties with the dealer and gets their bet back (total funds: {funds}).",
+    'loss': "Player {player} loses their bet of {bet} (total funds: {funds}).",
+}
+
+def render(event, fields):
+    return MESSAGES[event].format(**fields)
+
+class HandSnapshot(namedtuple('HandSnapshot', ['cards', 'value'])): # A hand as it was when an event was sent
+
+    def __str__(self):
+        return f"{', '.join(map(str, self.cards))} (Value: {self.value})"  # Same text as Hand
+
+def snapshot(field):
+    # Hands keep changing after they are sent, so kept events hold a copy of their cards and value
+    return HandSnapshot(tuple(field.cards), field.value) if hasattr(field, 'cards') else field
+
+class ConsoleSink: # Shows every event on the terminal as soon as it happens
+
+    def __init__(self, stream=None):
+        self.stream = stream  # None means whatever sys.stdout is at the time
+
+    def emit(self, event, **fields):
+        print(render(event, fields), file=self.stream)
+
+    def flush(self):
+        (self.stream or sys.stdout).flush()
+
+    def close(self):
+        self.flush()
+
+class BufferedSink: # Renders events into memory and writes them to a file in large batches
+
+    def __init__(self, file, buffer_lines=4096):
+        self.owns_file = isinstance(file, str)  # A path is opened and closed here; a file object is left open
+        self.file = open(file, 'a') if self.owns_file else file
+        self.buffer_lines = buffer_lines
+        self.lines = []
+
+    def emit(self, event, **fields):
+        self.lines.append(render(event, fields))
+        if len(self.lines) >= self.buffer_lines:
+            self.flush()
+
+    def flush(self):
+        if self.lines:
+            self.lines.append('')  # Ends the batch with a newline
+            self.file.write('\n'.join(self.lines))
+            self.lines.clear()
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        if self.owns_file:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class RecordingSink: # Keeps the events themselves, unrendered, for callers that want structured output
+
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event, **fields):
+        self.events.append((event, {name: snapshot(field) for name, field in fields.items()}))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+class NullSink: # Discards everything; a game with this sink does no formatting or I/O at all
+
+    def emit(self, event, **fields):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
@@ -0,0 +1,55 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from blackjack_engine import HeadlessGame
+from blackjack_stats import Aggregate
+from blackjack_vectorized import simulate_batch
+
+def worker_seeds(seed, workers):
+    # Independent 64-bit seeds for each worker, derived from one master seed
+    return [int(child.generate_state(1, np.uint64)[0]) for child in np.random.SeedSequence(seed).spawn(workers)]
+
+def split_rounds(rounds, workers):
+    share, extra = divmod(rounds, workers)
+    return [share + (1 if worker < extra else 0) for worker in range(workers)]
+
+def run_vectorized(rounds, seed, options):
+    stats = Aggregate()
+    stats.add_batch(simulate_batch(rounds, seed=seed, **options))
+    return stats
+
+def run_headless(rounds, seed, options):
+    options = dict(options)
+    players = options.pop('players', 1)
+    starting_funds = options.pop('starting_funds', 10 ** 9)
+    stats = Aggregate()
+    for result in HeadlessGame(players, starting_funds, seed=seed, **options).play_rounds(rounds):
+        stats.add_round(result)
+    return stats
+
+RUNNERS = {'vectorized': run_vectorized, 'headless': run_headless}
+
+def run_parallel(rounds, workers=None, seed=None, mode='vectorized', **options):
+    # Split the rounds across worker processes and merge their aggregates in worker order,
+    # so a given seed and worker count always produce identical results
+    if mode not in RUNNERS:
+        raise ValueError(f"Unknown mode {mode!r}, expected one of {sorted(RUNNERS)}.")
+    workers = workers or os.cpu_count() or 1
+    if seed is None:
+        seed = np.random.SeedSequence().entropy  # Fresh entropy, returned as total.seed so the run can be repeated
+    runner = RUNNERS[mode]
+    jobs = list(zip(split_rounds(rounds, workers), worker_seeds(seed, workers), [options] * workers))
+
+    if workers == 1:
+        parts = [runner(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(runner, *zip(*jobs)))
+
+    total = Aggregate()
+    for part in parts:
+        total.merge(part)
+    total.seed = seed  # Passing this and the same worker count back in repeats the run exactly
+    return total
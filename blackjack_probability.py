@@ -0,0 +1,83 @@
+from functools import lru_cache
+
+from CardGameLocal_FINAL import DEALER_STAND_VALUE, TRANSITIONS
+
+# Dealer outcomes are reported as a tuple of probabilities in OUTCOMES order: finishing on 17, 18,
+# 19, 20 or 21, or busting. Shoe compositions are tuples of ten counts for the card values 2-11
+# (all ten-value cards together, Aces last).
+
+OUTCOMES = (17, 18, 19, 20, 21, 'bust')
+BUST_INDEX = 5
+CARD_VALUES = tuple(range(2, 12))
+INFINITE_DECK = tuple(4 / 13 if value == 10 else 1 / 13 for value in CARD_VALUES)  # Chance of each value on every draw
+
+def shoe_composition(decks=1):
+    return tuple(16 * decks if value == 10 else 4 * decks for value in CARD_VALUES)
+
+def remove_cards(composition, *values):
+    counts = list(composition)
+    for value in values:
+        if not counts[value - 2]:
+            raise ValueError(f"No card worth {value} is left in the shoe.")
+        counts[value - 2] -= 1
+    return tuple(counts)
+
+def final_outcome(state):
+    # Outcome index for a dealer hand that has stopped drawing
+    value = state & 31
+    return BUST_INDEX if value > 21 else value - 17
+
+def one_hot(index):
+    return tuple(1.0 if position == index else 0.0 for position in range(len(OUTCOMES)))
+
+@lru_cache(maxsize=None)
+def infinite_deck_outcomes(state):
+    if (state & 31) >= DEALER_STAND_VALUE:
+        return one_hot(final_outcome(state))
+    result = [0.0] * len(OUTCOMES)
+    for value, chance in zip(CARD_VALUES, INFINITE_DECK):
+        for index, p in enumerate(infinite_deck_outcomes(TRANSITIONS[state * 12 + value])):
+            result[index] += chance * p
+    return tuple(result)
+
+def composition_outcomes(state, composition, memo):
+    # Exact recursion over the cards left in the shoe, memoized on (hand state, composition) for one query
+    if (state & 31) >= DEALER_STAND_VALUE:
+        return one_hot(final_outcome(state))
+    key = (state, composition)
+    if key in memo:
+        return memo[key]
+    remaining = sum(composition)
+    if not remaining:
+        return infinite_deck_outcomes(state)  # The shoe would be reshuffled here; treat it as a fresh, infinite one
+    result = [0.0] * len(OUTCOMES)
+    for position, count in enumerate(composition):
+        if count:
+            chance = count / remaining
+            following = composition[:position] + (count - 1,) + composition[position + 1:]
+            for index, p in enumerate(composition_outcomes(TRANSITIONS[state * 12 + position + 2], following, memo)):
+                result[index] += chance * p
+    memo[key] = result = tuple(result)
+    return result
+
+# Only answers are kept between queries, and only the most recent ones: a session asking about every
+# round's shoe would otherwise keep each composition it has ever seen
+@lru_cache(maxsize=1024)
+def shoe_outcomes(state, composition):
+    return composition_outcomes(state, composition, {})
+
+def dealer_outcomes(upcard, composition=None):
+    # Probabilities of the dealer's final total given their upcard value, following Game.dealer_turn.
+    # composition is what is left in the shoe once the upcard (and any other seen cards) are removed;
+    # None uses an infinite deck.
+    state = TRANSITIONS[upcard]  # Hand state after the upcard alone
+    if composition is None:
+        return infinite_deck_outcomes(state)
+    return shoe_outcomes(state, tuple(composition))
+
+def dealer_bust_chance(upcard, composition=None):
+    return dealer_outcomes(upcard, composition)[BUST_INDEX]
+
+def clear_cache():
+    infinite_deck_outcomes.cache_clear()
+    shoe_outcomes.cache_clear()
@@ -0,0 +1,110 @@
+from CardGameLocal_FINAL import Shoe, FastHand, DEALER_STAND_VALUE, settle_bet
+from blackjack_engine import SeatResult, RoundResult, outcome_for
+from blackjack_log import read_log, check_header
+from blackjack_shuffle import SeededShuffler
+
+# A round played by the headless engine is fixed by the seed of the shoe's shuffle, how many cards
+# had been dealt from it, and each seat's bet and hit/stand decisions. Replaying those reproduces the
+# exact cards, hands and settlement. A whole session is reproduced by HeadlessGame with the same seed.
+
+class ReplayError(Exception): # Raised when recorded decisions cannot have happened in the replayed round
+    pass
+
+class Replayer: # Rebuilds rounds from their shuffle seed, shoe position and recorded decisions
+
+    def __init__(self, decks=1):
+        self.shoe = Shoe(decks, shuffler=SeededShuffler(0))
+        self.seed = None
+        self.order = None  # Shoe order for self.seed, kept because consecutive rounds share a shuffle
+        self.next_seed = None
+
+    def position_shoe(self, seed, position):
+        shoe = self.shoe
+        if seed != self.seed:
+            shoe.shuffler.seed = seed
+            shoe.shuffle()
+            self.seed, self.order, self.next_seed = seed, list(shoe.cards), shoe.shuffler.seed
+        else:
+            shoe.cards[:] = self.order  # Undo any reshuffle made by the previous replay
+            shoe.shuffler.seed = self.next_seed
+        shoe.dealt = position
+
+    def replay(self, seed, position, seats, number=0):
+        # seats is a sequence of (seat, bet, actions, decisions) in the order the seats were dealt
+        self.position_shoe(seed, position)
+        shoe = self.shoe
+        hands = []
+        for _ in seats:
+            hand = FastHand()
+            hand.add_card(shoe.deal())
+            hand.add_card(shoe.deal())
+            hands.append(hand)
+        dealer = FastHand()
+        dealer.add_card(shoe.deal())
+        dealer.add_card(shoe.deal())
+
+        for hand, (seat, bet, actions, decisions) in zip(hands, seats):
+            for decision in range(decisions):
+                if hand.value >= 21:
+                    raise ReplayError(f"Seat {seat} made a decision on {hand.value} in round {number}.")
+                if not actions >> decision & 1:
+                    break
+                hand.add_card(shoe.deal())
+        while dealer.value < DEALER_STAND_VALUE:
+            dealer.add_card(shoe.deal())
+
+        results = []
+        for hand, (seat, bet, actions, decisions) in zip(hands, seats):
+            payout = settle_bet(hand.value, dealer.value, bet)
+            results.append(SeatResult(seat, bet, hand.value, payout, payout - bet, outcome_for(hand.value, payout, bet),
+                                      tuple(hand.cards), actions, decisions))
+        return RoundResult(number, dealer.value, tuple(results), seed, position, tuple(dealer.cards))
+
+    def replay_result(self, result):
+        # Replay a blackjack_engine.RoundResult from its seed, position and decisions alone
+        seats = [(seat.seat, seat.bet, seat.actions, seat.decisions) for seat in result.seats]
+        return self.replay(result.seed, result.position, seats, result.number)
+
+def group_rounds(records):
+    # Split consecutive log records into rounds: (start, stop) index ranges sharing a round number
+    rounds = records['round'].tolist()
+    start = 0
+    for index in range(1, len(rounds) + 1):
+        if index == len(rounds) or rounds[index] != rounds[start]:
+            yield start, index
+            start = index
+
+def verify_log(path, chunk_size=1 << 20):
+    # Replay every round in a hand-history log and return the round numbers whose cards or payouts differ.
+    # The shoe is rebuilt with the deck count stored in the log's header
+    records = read_log(path)
+    replayer = Replayer(check_header(path))
+    mismatches = []
+    start = 0
+    while start < len(records):
+        stop = min(start + chunk_size, len(records))
+        # Extend the chunk so a round is never split between chunks
+        while stop < len(records) and records['round'][stop] == records['round'][stop - 1]:
+            stop += 1
+        chunk = records[start:stop]
+        columns = {name: chunk[name].tolist() for name in ('round', 'seed', 'position', 'seat', 'bet', 'actions',
+                                                            'decisions', 'payout', 'player_count', 'dealer_count')}
+        player_cards, dealer_cards = chunk['player_cards'].tolist(), chunk['dealer_cards'].tolist()
+        for first, last in group_rounds(chunk):
+            seats = [(columns['seat'][i], columns['bet'][i], columns['actions'][i], columns['decisions'][i]) for i in range(first, last)]
+            number = columns['round'][first]
+            try:
+                result = replayer.replay(columns['seed'][first], columns['position'][first], seats, number)
+            except ReplayError:
+                mismatches.append(number)
+                continue
+            logged_dealer = dealer_cards[first][:columns['dealer_count'][first]]
+            same = [card.code for card in result.dealer_cards] == logged_dealer
+            for offset, seat in enumerate(result.seats):
+                i = first + offset
+                same = same and seat.payout == columns['payout'][i] and \
+                    [card.code for card in seat.cards] == player_cards[i][:columns['player_count'][i]]
+            if not same:
+                mismatches.append(number)
+        start = stop
+    return mismatches
@@ -0,0 +1,83 @@
+from fractions import Fraction
+
+from CardGameLocal_FINAL import HAND_STATES, SOFT_FLAG, DEALER_STAND_VALUE, settle_bet
+
+class Rules: # House rules for a table; the defaults are the rules Game has always played
+
+    def __init__(self, dealer_hits_soft_17=False, blackjack_payout=None, double=False, split=False, surrender=False, decks=1):
+        if not isinstance(decks, int) or decks < 1:
+            raise ValueError("A shoe needs at least one deck.")
+        if blackjack_payout is not None:
+            numerator, denominator = blackjack_payout
+            if numerator < 1 or denominator < 1:
+                raise ValueError("The blackjack payout must be a positive ratio such as (3, 2).")
+        self.dealer_hits_soft_17 = dealer_hits_soft_17
+        # (numerator, denominator) a natural pays, such as (3, 2) or (6, 5). None treats a two-card 21 like any other 21.
+        # With naturals the dealer checks for one before anyone plays, and a natural beats every other 21
+        self.blackjack_payout = blackjack_payout
+        self.double = double  # Double the bet on the first two cards for exactly one more card, also after a split
+        self.split = split  # Split a pair into two hands once; split Aces get one card each
+        self.surrender = surrender  # Give up the first two cards for half the bet back (late surrender)
+        self.decks = decks
+        # Whether the dealer hits each hand state, indexed by state like CardGameLocal_FINAL.TRANSITIONS
+        self.dealer_hits = bytes((state & 31) < DEALER_STAND_VALUE or (dealer_hits_soft_17 and state == DEALER_STAND_VALUE | SOFT_FLAG)
+                                 for state in range(HAND_STATES))
+
+    @property
+    def naturals(self):
+        return self.blackjack_payout is not None
+
+    @property
+    def fractional_payouts(self):
+        # True when some payout can be a fraction of a unit: 3:2 or 6:5 on an odd bet, or half a surrendered one
+        return self.surrender or (self.naturals and self.blackjack_payout[1] != 1)
+
+    @property
+    def extended(self):
+        # True when a round needs more than hit or stand and the even-money settle_bet
+        return self.naturals or self.double or self.split or self.surrender
+
+    def natural_payout(self, bet):
+        # Returned for a natural: the bet plus the payout ratio of it
+        numerator, denominator = self.blackjack_payout
+        return bet + share(bet * numerator, denominator)
+
+    def settle(self, value, dealer_value, bet, natural=False, dealer_natural=False, surrendered=False):
+        # settle_bet for these rules: the amount paid back for one hand
+        if surrendered:
+            return share(bet, 2)
+        if natural and not dealer_natural:
+            return self.natural_payout(bet)
+        if dealer_natural:
+            return bet if natural else 0
+        return settle_bet(value, dealer_value, bet)
+
+    def __eq__(self, other):
+        return isinstance(other, Rules) and vars(self) == vars(other)
+
+    def __hash__(self):
+        # Rules are never changed once made, so equal rules can key dicts and sets; dealer_hits follows from the rest
+        return hash((self.dealer_hits_soft_17, self.blackjack_payout, self.double, self.split, self.surrender, self.decks))
+
+    def __repr__(self):
+        return (f"Rules(dealer_hits_soft_17={self.dealer_hits_soft_17}, blackjack_payout={self.blackjack_payout}, "
+                f"double={self.double}, split={self.split}, surrender={self.surrender}, decks={self.decks})")
+
+def share(amount, parts):
+    # amount / parts exactly: a whole number when it divides, otherwise a Fraction, so funds never pick
+    # up rounding errors and stay integers wherever they can
+    whole, rest = divmod(amount, parts)
+    return Fraction(amount, parts) if rest else whole
+
+def is_natural(hand):
+    return hand.value == 21 and len(hand.cards) == 2
+
+ORIGINAL = Rules()  # What Game plays: the dealer stands on all 17s and every win pays 1:1
+
+# A few common house variants by name
+HOUSE_RULES = {
+    'original': ORIGINAL,
+    'vegas-strip': Rules(blackjack_payout=(3, 2), double=True, split=True, surrender=True, decks=4),
+    'downtown': Rules(dealer_hits_soft_17=True, blackjack_payout=(3, 2), double=True, split=True, decks=2),
+    'six-to-five': Rules(dealer_hits_soft_17=True, blackjack_payout=(6, 5), double=True, split=True, decks=6),
+}
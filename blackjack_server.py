@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import json
+import random
+
+from CardGameLocal_FINAL import Shoe, FastHand, DEALER_STAND_VALUE, settle_bet
+from blackjack_engine import outcome_for
+
+# Line protocol: every message is one JSON object per line.
+#
+#   client -> server   {"action": "join", "players": 2, "funds": 100}    first message, opens a table
+#                      {"action": "bet", "amount": 10}                    answer to a "bet" prompt
+#                      {"action": "hit"} / {"action": "stand"}            answer to a "turn" prompt
+#                      {"action": "quit"}                                  leave the table at any prompt
+#   server -> client   {"event": ...} messages: table, bet, deal, turn, card, bust, dealer, result,
+#                      timeout, error and game_over
+#
+# A prompt that is not answered within the action timeout gets the same default a cautious player
+# would choose: the minimum bet of 1, or stand.
+
+MAX_PLAYERS = 5
+MAX_FUNDS = 1000
+
+class ClientGone(Exception): # Raised when the client quits or disconnects
+    pass
+
+class Table: # A non-blocking game of Blackjack for one connection
+
+    def __init__(self, reader, writer, players, funds, decks=1, action_timeout=30.0, max_timeouts=3, rng=None):
+        self.reader = reader
+        self.writer = writer
+        self.action_timeout = action_timeout
+        self.max_timeouts = max_timeouts  # Close the table after this many unanswered prompts in a row
+        self.timeouts = 0
+        self.players = [{'seat': seat, 'hand': FastHand(), 'funds': funds, 'bet': 0} for seat in range(players)]
+        self.dealer = FastHand()
+        self.deck = Shoe(decks, rng=rng)
+
+    async def send(self, event, **fields):
+        fields['event'] = event
+        self.writer.write(json.dumps(fields).encode() + b'\n')
+        await self.writer.drain()
+
+    async def ask(self, event, actions, **fields):
+        # Prompt the client and wait for one of the expected actions; None means the prompt timed out
+        await self.send(event, **fields)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.action_timeout
+        while True:
+            try:
+                line = await asyncio.wait_for(self.reader.readline(), max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                if self.timeouts >= self.max_timeouts:
+                    raise ClientGone()
+                await self.send('timeout', prompt=event)
+                return None
+            except ValueError:
+                # A line longer than the stream limit; the rest of it cannot be told apart from the next message
+                await self.send('error', message="Message too long.")
+                raise ClientGone()
+            if not line:
+                raise ClientGone()  # Connection closed
+            try:
+                message = json.loads(line)
+                action = message['action']
+            except (ValueError, TypeError, KeyError):
+                await self.send('error', message="Expected a JSON object with an 'action'.")
+                continue
+            if action == 'quit':
+                raise ClientGone()
+            if action in actions:
+                self.timeouts = 0
+                return message
+            await self.send('error', message=f"Expected one of {list(actions)}.")
+
+    async def collect_bets(self):
+        for player in self.players:
+            bet = None
+            while bet is None:
+                message = await self.ask('bet', ('bet',), seat=player['seat'], funds=player['funds'])
+                if message is None:
+                    bet = 1  # Minimum bet when the client does not answer in time
+                    break
+                try:
+                    amount = int(message.get('amount'))
+                except (TypeError, ValueError):
+                    amount = 0
+                if 1 <= amount <= player['funds']:
+                    bet = amount
+                else:
+                    await self.send('error', message=f"Bet must be between 1 and {player['funds']}.")
+            player['bet'] = bet
+            player['funds'] -= bet
+
+    def initial_deal(self):
+        for player in self.players:
+            player['hand'] = FastHand()
+            player['hand'].add_card(self.deck.deal())
+            player['hand'].add_card(self.deck.deal())
+        self.dealer = FastHand()
+        self.dealer.add_card(self.deck.deal())
+        self.dealer.add_card(self.deck.deal())
+
+    async def player_turn(self, player):
+        hand = player['hand']
+        while hand.value < 21:
+            message = await self.ask('turn', ('hit', 'stand'), seat=player['seat'], cards=describe(hand), value=hand.value)
+            if message is None or message['action'] == 'stand':
+                return
+            card = self.deck.deal()
+            hand.add_card(card)
+            await self.send('card', seat=player['seat'], card=str(card), value=hand.value)
+        if hand.value > 21:
+            await self.send('bust', seat=player['seat'], value=hand.value)
+
+    def dealer_turn(self):
+        while self.dealer.value < DEALER_STAND_VALUE:
+            self.dealer.add_card(self.deck.deal())
+
+    async def determine_winners(self):
+        dealer_value = self.dealer.value
+        seats = []
+        for player in self.players:
+            value = player['hand'].value
+            payout = settle_bet(value, dealer_value, player['bet'])
+            player['funds'] += payout
+            seats.append({'seat': player['seat'], 'value': value, 'bet': player['bet'], 'payout': payout,
+                          'outcome': outcome_for(value, payout, player['bet']), 'funds': player['funds']})
+        await self.send('dealer', cards=describe(self.dealer), value=dealer_value)
+        await self.send('result', seats=seats)
+
+    async def play_round(self):
+        # Same flow as Game.start_game: bets, initial deal, player turns, dealer turn, settlement
+        self.deck.check_cut_card()
+        await self.collect_bets()
+        self.initial_deal()
+        await self.send('deal', dealer_upcard=str(self.dealer.cards[0]),
+                        seats=[{'seat': player['seat'], 'cards': describe(player['hand']), 'value': player['hand'].value}
+                               for player in self.players])
+        for player in self.players:
+            await self.player_turn(player)
+        self.dealer_turn()
+        await self.determine_winners()
+
+    async def play(self):
+        await self.send('table', seats=len(self.players), funds=[player['funds'] for player in self.players])
+        try:
+            while True:
+                self.players = [player for player in self.players if player['funds'] > 0]  # Remove players who have no funds left
+                if not self.players:
+                    await self.send('game_over', message="No players have enough funds to continue.")
+                    return
+                await self.play_round()
+        except ClientGone:
+            pass
+
+def describe(hand):
+    return [str(card) for card in hand.cards]
+
+class Server: # Accepts connections and runs one Table per client, all on one event loop
+
+    def __init__(self, decks=1, action_timeout=30.0, max_timeouts=3, seed=None):
+        self.decks = decks
+        self.action_timeout = action_timeout
+        self.max_timeouts = max_timeouts
+        self.rng = random.Random(seed)
+        self.tables = 0  # Tables currently being played
+
+    async def handle(self, reader, writer):
+        try:
+            table = await self.open_table(reader, writer)
+            if table is not None:
+                self.tables += 1
+                try:
+                    await table.play()
+                finally:
+                    self.tables -= 1
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def open_table(self, reader, writer):
+        try:
+            line = await asyncio.wait_for(reader.readline(), self.action_timeout)
+            message = json.loads(line)
+            players = int(message.get('players', 1))
+            funds = int(message.get('funds', 100))
+            if message.get('action') != 'join':
+                raise ValueError()
+        except (asyncio.TimeoutError, ValueError, TypeError, AttributeError):
+            writer.write(b'{"event": "error", "message": "Send {\\"action\\": \\"join\\"} to open a table."}\n')
+            return None
+        if not (1 <= players <= MAX_PLAYERS and 1 <= funds <= MAX_FUNDS):
+            writer.write(json.dumps({'event': 'error', 'message': f"Use 1-{MAX_PLAYERS} players and 1-{MAX_FUNDS} funds."}).encode() + b'\n')
+            return None
+        rng = random.Random(self.rng.getrandbits(64))  # Every table shuffles from its own generator
+        return Table(reader, writer, players, funds, self.decks, self.action_timeout, self.max_timeouts, rng)
+
+    async def start(self, host='127.0.0.1', port=8765):
+        return await asyncio.start_server(self.handle, host, port)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve many Blackjack tables over a JSON line protocol.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--decks', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=30.0, help="seconds to wait for each action")
+    args = parser.parse_args(argv)
+
+    async def run():
+        server = await Server(args.decks, args.timeout).start(args.host, args.port)
+        print(f"Serving Blackjack on {args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
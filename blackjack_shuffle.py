@@ -0,0 +1,156 @@
+import random
+from array import array
+from operator import attrgetter, itemgetter
+
+WORD_BITS = 32
+WORD_RANGE = 1 << WORD_BITS
+TYPECODE = 'I' if array('I').itemsize == 4 else 'L'  # An unsigned 32-bit array type on this platform
+
+swap_steps = {}  # Deck size -> precomputed (position, bound, rejection limit) for each swap, shared by all shufflers
+
+class BufferedShuffler: # Fisher-Yates shuffle fed by random words generated in bulk
+
+    def __init__(self, rng=None, buffer_size=2048):
+        self.rng = rng if rng is not None else random  # Anything with getrandbits: the random module, Random, SystemRandom
+        self.buffer_size = buffer_size
+        self.words = array(TYPECODE)
+        self.index = 0
+
+    def refill(self, needed):
+        # Keep the unused words and top the buffer up with one big getrandbits call
+        count = max(self.buffer_size, needed)
+        words = array(TYPECODE, self.words[self.index:])
+        bits = self.rng.getrandbits(WORD_BITS * count)
+        words.frombytes(bits.to_bytes(count * 4, 'little'))
+        self.words = words
+        self.index = 0
+
+    def swaps(self, size):
+        steps = swap_steps.get(size)
+        if steps is None:
+            # A word is accepted for bound n only below the largest multiple of n, so word % n is exactly uniform
+            steps = [(i, i + 1, WORD_RANGE - WORD_RANGE % (i + 1)) for i in range(size - 1, 0, -1)]
+            swap_steps[size] = steps
+        return steps
+
+    def shuffle(self, cards):
+        steps = self.swaps(len(cards))
+        if len(self.words) - self.index < len(steps):
+            self.refill(len(steps))
+        words, index = self.words, self.index
+        for i, bound, limit in steps:
+            word = words[index]
+            index += 1
+            while word >= limit:
+                word = self.rng.getrandbits(WORD_BITS)  # Rare rejection: redraw directly
+            j = word % bound
+            cards[i], cards[j] = cards[j], cards[i]  # Swap the cards
+        self.index = index
+
+class SeededShuffler: # Every shuffle is fully determined by one 64-bit seed, so any shoe order can be rebuilt
+
+    def __init__(self, seed):
+        self.seed = seed  # Seed for the next shuffle
+        self.last_seed = None  # Seed that produced the current order
+
+    def shuffle(self, cards):
+        cards.sort(key=attrgetter('code'))  # Start from the unshuffled order so only the seed matters
+        rng = random.Random(self.seed)
+        BufferedShuffler(rng, buffer_size=len(cards)).shuffle(cards)
+        self.last_seed = self.seed
+        self.seed = rng.getrandbits(64)  # Each shuffle seeds the next, so a whole session follows from its first seed
+
+class NumpyShuffler: # Shuffles by applying a permutation drawn from a NumPy generator
+
+    def __init__(self, rng=None):
+        import numpy as np  # Only needed for this backend
+        self.rng = rng if isinstance(rng, np.random.Generator) else np.random.default_rng(rng)
+
+    def shuffle(self, cards):
+        if len(cards) > 1:
+            cards[:] = itemgetter(*self.rng.permutation(len(cards)).tolist())(cards)
+
+class RandintShuffler: # The original per-position random.randint Fisher-Yates, kept for comparison
+
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else random
+
+    def shuffle(self, cards):
+        for i in range(len(cards) - 1, 0, -1):
+            j = self.rng.randint(0, i)
+            cards[i], cards[j] = cards[j], cards[i]
+
+def permutations(count, size, rng=None):
+    # (count, size) array whose rows are independent, uniformly random orderings of 0..size-1
+    import numpy as np
+    rng = rng if isinstance(rng, np.random.Generator) else np.random.default_rng(rng)
+    order = np.arange(size, dtype=np.uint16)
+    return rng.permuted(np.broadcast_to(order, (count, size)), axis=1)  # One C-level Fisher-Yates per row
+
+def shuffled_decks(count, decks=1, rng=None):
+    # (count, 52 * decks) array of card codes (Card.code, 0-51), one freshly shuffled shoe per row
+    return (permutations(count, 52 * decks, rng) % 52).astype('uint8')
+
+def shoe_tops(count, decks=1, depth=52, rng=None, block=4096):
+    # First depth card codes of count uniformly shuffled shoes. Only those positions are shuffled
+    # (a partial Fisher-Yates with one vectorized swap per position), so the cost grows with the
+    # depth rather than the shoe size; rows are done a block at a time to stay in cache
+    import numpy as np
+    rng = rng if isinstance(rng, np.random.Generator) else np.random.default_rng(rng)
+    size = 52 * decks
+    depth = min(depth, size)
+    unshuffled = (np.arange(size) % 52).astype(np.uint8)
+    tops = np.empty((count, depth), dtype=np.uint8)
+    for start in range(0, count, block):
+        rows = min(block, count - start)
+        cards = np.tile(unshuffled, (rows, 1))
+        flat = cards.reshape(-1)
+        offsets = np.arange(rows) * size  # Start of each row in flat
+        for position in range(min(depth, size - 1)):
+            swap = rng.integers(position, size, rows) + offsets
+            here = offsets + position
+            chosen = flat[swap]
+            flat[swap] = flat[here]
+            flat[here] = chosen
+        tops[start:start + rows] = cards[:, :depth]
+    return tops
+
+def iter_decks(decks=1, batch=4096, rng=None):
+    # Endless stream of shuffled shoes as rows of card codes, generated a batch at a time
+    import numpy as np
+    rng = rng if isinstance(rng, np.random.Generator) else np.random.default_rng(rng)
+    while True:
+        yield from shuffled_decks(batch, decks, rng)
+
+class BatchShuffler: # Shuffles a Deck or Shoe with orderings taken from a pregenerated batch
+
+    def __init__(self, rng=None, batch=4096):
+        import numpy as np
+        self.rng = rng if isinstance(rng, np.random.Generator) else np.random.default_rng(rng)
+        self.batch = batch
+        self.orders = iter(())
+        self.size = None
+
+    def shuffle(self, cards):
+        if len(cards) != self.size:
+            self.size = len(cards)
+            self.orders = iter(())  # Batches are generated for one deck size at a time
+        order = next(self.orders, None)
+        if order is None:
+            self.orders = iter(permutations(self.batch, self.size, self.rng).tolist())
+            order = next(self.orders)
+        if self.size > 1:
+            cards[:] = itemgetter(*order)(cards)
+
+BACKENDS = {'buffered': BufferedShuffler, 'numpy': NumpyShuffler, 'batch': BatchShuffler, 'randint': RandintShuffler}
+
+shared_shuffler = BufferedShuffler()  # Used by every deck that has no generator of its own
+
+def make_shuffler(backend='buffered', rng=None):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown shuffle backend {backend!r}, expected one of {sorted(BACKENDS)}.")
+    if backend == 'buffered' and rng is None:
+        return shared_shuffler
+    if backend in ('buffered', 'randint') and isinstance(rng, int):
+        rng = random.Random(rng)  # A plain seed is turned into a private generator
+    return BACKENDS[backend](rng)
@@ -0,0 +1,140 @@
+from statistics import NormalDist
+
+from blackjack_engine import WIN, TIE, LOSS, BUST
+
+TOTALS = 32  # Histogram bins for hand totals 0-31; every reachable total, bust ones included, fits
+
+class RunningStats: # Count, mean and variance of net results that can be merged across workers
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared differences from the mean (Welford)
+        self.outcomes = {WIN: 0, TIE: 0, LOSS: 0, BUST: 0}
+
+    def add(self, net, outcome=None):
+        self.count += 1
+        delta = net - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (net - self.mean)
+        if outcome is not None:
+            self.outcomes[outcome] += 1
+
+    def add_round(self, result):
+        # Add every seat of a blackjack_engine.RoundResult
+        for seat in result.seats:
+            self.add(seat.net, seat.outcome)
+
+    def add_batch(self, result):
+        # Add a blackjack_vectorized.BatchResult in one step
+        if len(result.net):
+            self.merge(summarise(result.net, result.player_values))
+
+    def merge(self, other):
+        # Combine two partial results (Chan et al. parallel variance update)
+        if not other.count:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        for outcome, total in other.outcomes.items():
+            self.outcomes[outcome] += total
+        return self
+
+    def rates(self):
+        # Share of results with each outcome
+        return {outcome: total / self.count if self.count else 0.0 for outcome, total in self.outcomes.items()}
+
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def stderr(self):
+        return (self.variance() / self.count) ** 0.5 if self.count else 0.0
+
+    def interval(self, confidence=0.95):
+        # Normal-approximation confidence interval for the mean
+        half = NormalDist().inv_cdf(0.5 + confidence / 2) * self.stderr()
+        return self.mean - half, self.mean + half
+
+    def __repr__(self):
+        return f"RunningStats(count={self.count}, mean={self.mean:.6f}, stderr={self.stderr():.6f})"
+
+def summarise(net, player_values=None):
+    # RunningStats for an array of net results in one vectorized pass; outcomes are only counted
+    # when the player's final totals are given
+    stats = RunningStats()
+    stats.count = len(net)
+    stats.mean = float(net.mean())
+    stats.m2 = float(((net - stats.mean) ** 2).sum())
+    if player_values is None:
+        return stats
+    bust = player_values > 21
+    stats.outcomes = {WIN: int((net > 0).sum()), TIE: int((net == 0).sum()),
+                      LOSS: int(((net < 0) & ~bust).sum()), BUST: int(bust.sum())}
+    return stats
+
+class Aggregate(RunningStats): # RunningStats plus bankroll drawdown and histograms of final totals, in constant memory
+
+    # The bankroll path is the running sum of net results in the order they are added. A stretch of it
+    # is summed up by its total, the highest and lowest points reached (relative to its start, which
+    # counts too) and its largest drawdown; from those, two consecutive stretches combine exactly.
+
+    def __init__(self):
+        super().__init__()
+        self.total = 0  # Net over every result: where the bankroll ends relative to its start
+        self.peak = 0
+        self.low = 0
+        self.max_drawdown = 0  # Largest fall from a high point to a later low point
+        self.player_totals = [0] * TOTALS  # Count of hands finishing on each total
+        self.dealer_totals = [0] * TOTALS  # Dealer total each of those hands was settled against
+
+    def add(self, net, outcome=None):
+        super().add(net, outcome)
+        self.total = total = self.total + net
+        if total > self.peak:
+            self.peak = total
+        elif total < self.low:
+            self.low = total
+        if self.peak - total > self.max_drawdown:
+            self.max_drawdown = self.peak - total
+
+    def add_round(self, result):
+        for seat in result.seats:
+            self.add(seat.net, seat.outcome)
+            self.player_totals[seat.value] += 1
+            self.dealer_totals[result.dealer_value] += 1
+
+    def add_batch(self, result):
+        # Add a blackjack_vectorized.BatchResult in one step, in the order of its entries
+        import numpy as np
+        net = result.net
+        if not len(net):
+            return
+        batch = Aggregate()
+        RunningStats.merge(batch, summarise(net, result.player_values))
+        path = np.cumsum(net, dtype=np.float64 if net.dtype.kind == 'f' else np.int64)  # Fractional under some rules
+        highs = np.maximum.accumulate(np.maximum(path, 0))  # Highest point so far, the start included
+        batch.total = path[-1].item()
+        batch.peak = highs[-1].item()
+        batch.low = min(path.min().item(), 0)
+        batch.max_drawdown = (highs - path).max().item()
+        batch.player_totals = np.bincount(result.player_values, minlength=TOTALS).tolist()
+        batch.dealer_totals = np.bincount(result.dealer_values, minlength=TOTALS).tolist()
+        self.merge(batch)
+
+    def merge(self, other):
+        # Combine with the results that came after these; unlike RunningStats.merge the order matters
+        RunningStats.merge(self, other)
+        self.max_drawdown = max(self.max_drawdown, other.max_drawdown, self.peak - (self.total + other.low))
+        self.peak = max(self.peak, self.total + other.peak)
+        self.low = min(self.low, self.total + other.low)
+        self.total += other.total
+        self.player_totals = [mine + theirs for mine, theirs in zip(self.player_totals, other.player_totals)]
+        self.dealer_totals = [mine + theirs for mine, theirs in zip(self.dealer_totals, other.dealer_totals)]
+        return self
+
+    def __repr__(self):
+        return (f"Aggregate(count={self.count}, mean={self.mean:.6f}, stderr={self.stderr():.6f}, "
+                f"total={self.total}, max_drawdown={self.max_drawdown})")
@@ -0,0 +1,202 @@
+from functools import lru_cache
+
+from CardGameLocal_FINAL import TRANSITIONS, HAND_STATES, REACHABLE_STATES, SOFT_FLAG, DEALER_STAND_VALUE
+from blackjack_probability import CARD_VALUES, INFINITE_DECK, BUST_INDEX, dealer_outcomes, remove_cards
+
+UPCARDS = tuple(range(2, 12))  # Dealer upcard values, Ace as 11
+DECISION_STATES = tuple(state for state in REACHABLE_STATES if (state & 31) < 21)  # Every hand a player can be asked about
+
+class StrategyTable: # Hit or stand for every hand state and dealer upcard, looked up in O(1)
+
+    def __init__(self, hits=None, doubles=None, surrenders=None, splits=None):
+        # One byte per (hand state, upcard value), at state * 12 + upcard; 1 means hit
+        self.hits = bytearray(hits) if hits is not None else bytearray(HAND_STATES * 12)
+        # Where the rules allow them (see blackjack_rules): double or surrender on the first two cards, at
+        # state * 12 + upcard, and split a pair, at card value * 12 + upcard
+        self.doubles = bytearray(doubles) if doubles is not None else bytearray(HAND_STATES * 12)
+        self.surrenders = bytearray(surrenders) if surrenders is not None else bytearray(HAND_STATES * 12)
+        self.splits = bytearray(splits) if splits is not None else bytearray(12 * 12)
+
+    def set(self, value, soft, upcard, hit):
+        self.hits[(value | soft << 5) * 12 + upcard] = bool(hit)
+
+    def should_hit(self, state, upcard):
+        return self.hits[state * 12 + upcard]
+
+    def __call__(self, value, soft, dealer_upcard):
+        # Same signature as the blackjack_engine strategies, so a table can be passed straight to HeadlessGame
+        return self.hits[(value | soft << 5) * 12 + dealer_upcard]
+
+    def __eq__(self, other):
+        return isinstance(other, StrategyTable) and vars(self) == vars(other)
+
+    __hash__ = None  # Unhashable on purpose: the tables are edited in place, which would change their hash
+
+    def array(self, decisions='hits'):
+        # The same bytes as a NumPy array, without copying, for vectorized lookups at state * 12 + upcard
+        import numpy as np
+        return np.frombuffer(getattr(self, decisions), dtype=np.uint8)
+
+    def mark(self, value, soft, upcard):
+        index = (value | soft << 5) * 12 + upcard
+        if self.surrenders[index]:
+            return 'R'
+        if self.doubles[index]:
+            return 'D'
+        return 'H' if self.hits[index] else 'S'
+
+    def chart(self):
+        # Text chart in the usual layout: hard totals then soft totals down, dealer upcards across
+        lines = ['       ' + ' '.join(f"{'A' if upcard == 11 else upcard:>2}" for upcard in UPCARDS)]
+        for soft, label, values in ((False, 'Hard', range(4, 21)), (True, 'Soft', range(12, 21))):
+            for value in values:
+                marks = ' '.join(f" {self.mark(value, soft, upcard)}" for upcard in UPCARDS)
+                lines.append(f"{label} {value:>2} {marks}")
+        if any(self.splits):
+            for card in UPCARDS:
+                marks = ' '.join(' P' if self.splits[card * 12 + upcard] else ' N' for upcard in UPCARDS)
+                lines.append(f"Pair {'A' if card == 11 else card:>2} {marks}")
+        return '\n'.join(lines)
+
+# Strategies can be written as a StrategyTable, a hit threshold, a callable strategy(value, soft,
+# dealer_upcard) like those in blackjack_engine, a chart in the layout StrategyTable.chart prints,
+# or a dict of chart rows: {'hard': {16: 'SSSSSHHHHH', ...}, 'soft': {18: 'SSSSSSSHHH', ...}} with
+# one H or S per upcard from 2 to Ace. Hands a chart or dict leaves out hit below the default.
+# Hard and soft rows can also mark D (double, or hit where doubling is not allowed) and R (surrender,
+# or hit), and 'pair' rows mark P to split a pair of that card value or N not to.
+
+def threshold_table(threshold):
+    table = StrategyTable()
+    for state in DECISION_STATES:
+        for upcard in UPCARDS:
+            table.hits[state * 12 + upcard] = (state & 31) < threshold
+    return table
+
+def table_from_rows(rows, default=DEALER_STAND_VALUE):
+    table = threshold_table(default)
+    for kind, soft in (('hard', False), ('soft', True)):
+        for value, marks in rows.get(kind, {}).items():
+            marks = marks.replace(' ', '').upper()
+            if len(marks) != len(UPCARDS) or set(marks) - {'H', 'S', 'D', 'R'}:
+                raise ValueError(f"The {kind} {value} row needs one H, S, D or R for each of the {len(UPCARDS)} upcards.")
+            for upcard, mark in zip(UPCARDS, marks):
+                index = (value | soft << 5) * 12 + upcard
+                table.hits[index] = mark != 'S'
+                table.doubles[index] = mark == 'D'
+                table.surrenders[index] = mark == 'R'
+    for card, marks in rows.get('pair', {}).items():
+        marks = marks.replace(' ', '').upper()
+        if len(marks) != len(UPCARDS) or set(marks) - {'P', 'N'}:
+            raise ValueError(f"The pair {card} row needs one P or N for each of the {len(UPCARDS)} upcards.")
+        for upcard, mark in zip(UPCARDS, marks):
+            table.splits[card * 12 + upcard] = mark == 'P'
+    return table
+
+def parse_chart(text, default=DEALER_STAND_VALUE):
+    rows = {'hard': {}, 'soft': {}, 'pair': {}}
+    for line in text.splitlines():
+        parts = line.split()
+        if parts and parts[0] in ('Hard', 'Soft', 'Pair'):
+            rows[parts[0].lower()][11 if parts[1] == 'A' else int(parts[1])] = ''.join(parts[2:])
+    return table_from_rows(rows, default)
+
+def compile_strategy(strategy, default=DEALER_STAND_VALUE):
+    # Turn any supported strategy into a StrategyTable, asking a callable once about every hand
+    # and upcard; afterwards each decision is a single lookup
+    if isinstance(strategy, StrategyTable):
+        return strategy
+    if isinstance(strategy, int):
+        return threshold_table(strategy)
+    if isinstance(strategy, str):
+        return parse_chart(strategy, default)
+    if isinstance(strategy, dict):
+        return table_from_rows(strategy, default)
+    if callable(strategy):
+        table = StrategyTable()
+        for state in DECISION_STATES:
+            value, soft = state & 31, state >= SOFT_FLAG
+            for upcard in UPCARDS:
+                table.hits[state * 12 + upcard] = bool(strategy(value, soft, upcard))
+        return table
+    raise TypeError(f"Cannot compile a strategy from {type(strategy).__name__}.")
+
+def stand_value(value, outcomes):
+    # Expected net result of standing on a total against a dealer outcome distribution
+    if value > 21:
+        return -1.0
+    win = outcomes[BUST_INDEX]
+    lose = 0.0
+    for index, total in enumerate(range(17, 22)):
+        if value > total:
+            win += outcomes[index]
+        elif value < total:
+            lose += outcomes[index]
+    return win - lose
+
+def solve_upcard(upcard, draws, outcomes):
+    # Best expected value of every hand state against one upcard, and whether hitting achieves it
+    best = {}
+    hits = {}
+
+    def value_of(state):
+        if state in best:
+            return best[state]
+        value = state & 31
+        stand = stand_value(value, outcomes)
+        if value >= 21:
+            best[state], hits[state] = stand, False  # 21 stands automatically and a bust is final
+            return stand
+        hit = sum(chance * value_of(TRANSITIONS[state * 12 + card]) for card, chance in draws)
+        best[state], hits[state] = max(stand, hit), hit > stand
+        return best[state]
+
+    for state in REACHABLE_STATES:
+        value_of(state)
+    return best, hits
+
+def solve(composition=None):
+    # Expected-value maximising hit/stand table for the rules in Game: 21 stands automatically, the
+    # dealer hits below 17 and every win pays 1:1. With a composition the dealer's outcomes are exact
+    # for that shoe and the player's draws use its proportions; None solves for an infinite deck.
+    # Every call returns a table of its own, so changing one cannot change later answers
+    return StrategyTable(solved_hits(None if composition is None else tuple(composition)))
+
+def draw_chances(composition):
+    # (card value, chance) of every value that can be drawn, from an infinite deck or the given shoe
+    if composition is None:
+        return tuple(zip(CARD_VALUES, INFINITE_DECK))
+    remaining = sum(composition)
+    return tuple((card, count / remaining) for card, count in zip(CARD_VALUES, composition) if count)
+
+@lru_cache(maxsize=64)
+def solved_hits(composition):
+    table = StrategyTable()
+    for upcard in UPCARDS:
+        # The player draws from the same shoe the dealer's outcomes are worked out for: the upcard is out of it
+        seen = None if composition is None else remove_cards(composition, upcard)
+        best, hits = solve_upcard(upcard, draw_chances(seen), dealer_outcomes(upcard, seen))
+        for state, hit in hits.items():
+            table.hits[state * 12 + upcard] = hit
+    return bytes(table.hits)
+
+def expected_value(table, composition=None):
+    # Expected net result per round of following a table from the first two cards, infinite deck or given shoe
+    total = 0.0
+    for upcard, upcard_chance in draw_chances(composition):
+        seen = None if composition is None else remove_cards(composition, upcard)
+        outcomes = dealer_outcomes(upcard, seen)
+        draws = draw_chances(seen)  # The player's cards come from the shoe without the upcard
+        memo = {}
+
+        def play(state):
+            if state not in memo:
+                if (state & 31) < 21 and table.should_hit(state, upcard):
+                    memo[state] = sum(chance * play(TRANSITIONS[state * 12 + card]) for card, chance in draws)
+                else:
+                    memo[state] = stand_value(state & 31, outcomes)
+            return memo[state]
+
+        for first, first_chance in draws:
+            for second, second_chance in draws:
+                total += upcard_chance * first_chance * second_chance * play(TRANSITIONS[TRANSITIONS[first] * 12 + second])
+    return total
@@ -0,0 +1,173 @@
+import numpy as np
+
+from CardGameLocal_FINAL import DEALER_STAND_VALUE, SOFT_FLAG, COUNT_SYSTEMS, RANK_VALUES
+from blackjack_vectorized import DECK_VALUES, TRANSITION_TABLE, BatchResult, settle, hit_mask, compile_policy
+
+# Many tables of many seats played in lockstep. Every seat's state lives in parallel (tables, seats)
+# arrays instead of per-player dicts: funds, bets and hand states (total | soft << 5, so totals, soft
+# and bust flags are all views of one array). Seats that run out of funds simply drop out of the
+# active mask. Seats at a table draw from the table's shoe in seat order when they are dealt in, and
+# together once hitting starts; with a shuffled shoe the draws are exchangeable, so the outcomes have
+# the same distribution as playing the seats one after another.
+
+def value_tags(counting):
+    # Count tags indexed by card value; every system tags the four ten-value ranks alike, so values are enough
+    tags = np.zeros(12, dtype=np.int8)
+    for rank, tag in enumerate(COUNT_SYSTEMS[counting]):
+        tags[RANK_VALUES[rank]] = tag
+    return tags
+
+class Tables: # Rounds of Blackjack for tables x seats players, one shoe per table
+
+    def __init__(self, tables, seats, starting_funds, policy=DEALER_STAND_VALUE, bet=1, decks=1, penetration=0.75, seed=None,
+                 counting=None):
+        if tables < 1 or seats < 1 or decks < 1 or not 0 < penetration <= 1:
+            raise ValueError("Tables need at least one table, seat and deck, and a penetration between 0 and 1.")
+        if 2 * seats + 2 > 52 * decks:
+            raise ValueError(f"A table of {seats} seats needs a shoe of at least {2 * seats + 2} cards to deal a round.")
+        self.rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+        self.policy = compile_policy(policy)  # Hit policy: a threshold, or anything compile_strategy takes
+        self.bet = bet  # An amount, or bet(funds) -> array of amounts for every seat
+        self.seats = seats
+        self.funds = np.full((tables, seats), starting_funds, dtype=np.int64)
+        self.bets = np.zeros((tables, seats), dtype=np.int64)
+        self.states = np.zeros((tables, seats), dtype=np.int8)  # Hand states, see CardGameLocal_FINAL.TRANSITIONS
+        self.dealer_states = np.zeros(tables, dtype=np.int8)
+        self.cards = self.rng.permuted(np.tile(np.tile(DECK_VALUES, decks), (tables, 1)), axis=1)  # One shuffled shoe per row
+        self.position = np.zeros(tables, dtype=np.intp)  # Cards dealt from each shoe
+        self.cut = int(self.cards.shape[1] * penetration)
+        self.tags = value_tags(counting) if counting is not None else None  # Counting is only paid for when asked for
+        self.counts = self.running_counts(self.cards) if counting is not None else None
+        self.rounds_played = 0
+
+    @property
+    def active(self):
+        return self.funds > 0  # Players who have no funds left are out
+
+    @property
+    def totals(self):
+        return self.states & 31
+
+    @property
+    def soft(self):
+        return self.states >= SOFT_FLAG
+
+    @property
+    def bust(self):
+        return self.totals > 21
+
+    def running_counts(self, cards):
+        # Running count after each card of each shoe, with the count before any card in front
+        counts = np.zeros((len(cards), cards.shape[1] + 1), dtype=np.int16)
+        np.cumsum(self.tags[cards], axis=1, out=counts[:, 1:])
+        return counts
+
+    def reshuffle(self, tables):
+        if tables.size:
+            self.cards[tables] = self.rng.permuted(self.cards[tables], axis=1)
+            if self.counts is not None:
+                self.counts[tables] = self.running_counts(self.cards[tables])
+            self.position[tables] = 0
+
+    def running_count(self):
+        # Running count of every table's shoe, from the cards dealt since its last shuffle
+        if self.counts is None:
+            raise ValueError("These tables were created without a counting system.")
+        return self.counts[np.arange(len(self.position)), self.position]
+
+    def true_count(self):
+        decks_left = (self.cards.shape[1] - self.position) / 52
+        return self.running_count() / np.maximum(decks_left, 1 / 52)
+
+    def select(self, tables):
+        # Keep only the given tables, in that order
+        for name in ('funds', 'bets', 'states', 'dealer_states', 'cards', 'counts', 'position'):
+            if getattr(self, name) is not None:
+                setattr(self, name, getattr(self, name)[tables])
+
+    def draw(self, tables, offsets, counts):
+        # Cards at each table's position plus offset; a shoe that would run dry is reshuffled first, like Shoe.deal
+        self.reshuffle(np.flatnonzero(self.position + counts > self.cards.shape[1]))
+        cards = self.cards[tables, self.position[tables] + offsets]
+        self.position += counts
+        return cards
+
+    def deal_seats(self, rows):
+        # One card for each flat seat index in rows (ascending), taken in seat order at each table
+        tables = rows // self.seats
+        counts = np.bincount(tables, minlength=len(self.position))
+        starts = np.cumsum(counts) - counts  # Where each table's rows begin in rows
+        cards = self.draw(tables, np.arange(len(rows)) - starts[tables], counts)
+        states = self.states.reshape(-1)
+        states[rows] = TRANSITION_TABLE.take(states[rows].astype(np.intp) * 12 + cards)
+
+    def collect_bets(self, active):
+        bets = self.bet(self.funds) if callable(self.bet) else np.full_like(self.funds, self.bet)
+        self.bets = np.where(active, np.clip(bets, 1, self.funds), 0)  # Same limits as HeadlessGame.collect_bets
+        self.funds -= self.bets
+
+    def initial_deal(self, active):
+        # Two cards to each seat in turn, then two to the dealer, as in Game.initial_deal
+        playing = active.any(axis=1)
+        seated = active.sum(axis=1)
+        counts = np.where(playing, 2 * seated + 2, 0)
+        self.reshuffle(np.flatnonzero(self.position + counts > self.cards.shape[1]))
+        rank = np.cumsum(active, axis=1) - 1  # Order of each active seat at its table
+        first = self.position[:, None] + 2 * rank
+        table_index = np.arange(len(self.position))[:, None]
+        width = self.cards.shape[1] - 1
+        self.states[:] = 0
+        for offset in (0, 1):
+            cards = self.cards[table_index, np.clip(first + offset, 0, width)]
+            self.states[active] = TRANSITION_TABLE.take(self.states[active].astype(np.intp) * 12 + cards[active])
+        dealer = self.position + 2 * seated
+        self.dealer_states[:] = 0
+        upcards = np.zeros(len(self.position), dtype=np.int8)
+        for offset in (0, 1):
+            cards = self.cards[np.flatnonzero(playing), dealer[playing] + offset]
+            if offset == 0:
+                upcards[playing] = cards
+            self.dealer_states[playing] = TRANSITION_TABLE.take(self.dealer_states[playing].astype(np.intp) * 12 + cards)
+        self.position += counts
+        return playing, upcards
+
+    def play_round(self):
+        # Play one round at every table; returns a BatchResult for the seats that played, or None when nobody can
+        active = self.active
+        if not active.any():
+            return None
+        self.reshuffle(np.flatnonzero(self.position >= self.cut))  # Cut card, as in Shoe.check_cut_card
+        self.collect_bets(active)
+        playing, upcards = self.initial_deal(active)
+
+        seat_upcards = np.repeat(upcards, self.seats)
+        states = self.states.reshape(-1)
+        rows = np.flatnonzero(active.reshape(-1))
+        rows = rows[((states[rows] & 31) < 21) & hit_mask(self.policy, states[rows], seat_upcards[rows])]
+        while rows.size:
+            self.deal_seats(rows)
+            hands = states[rows]
+            rows = rows[((hands & 31) < 21) & hit_mask(self.policy, hands, seat_upcards[rows])]
+
+        tables = np.flatnonzero(playing & ((self.dealer_states & 31) < DEALER_STAND_VALUE))  # The dealer plays out every round
+        while tables.size:
+            counts = np.bincount(tables, minlength=len(self.position))
+            cards = self.draw(tables, 0, counts)
+            self.dealer_states[tables] = TRANSITION_TABLE.take(self.dealer_states[tables].astype(np.intp) * 12 + cards)
+            tables = tables[(self.dealer_states[tables] & 31) < DEALER_STAND_VALUE]
+
+        # Settle every seat in one pass
+        player_values = self.totals
+        dealer_values = np.broadcast_to((self.dealer_states & 31)[:, None], player_values.shape)
+        payouts = settle(player_values, dealer_values) * self.bets
+        self.funds += payouts
+        self.rounds_played += 1
+        return BatchResult((payouts - self.bets)[active], player_values[active], dealer_values[active])
+
+    def play_rounds(self, rounds):
+        # Yield one BatchResult per round until the count is reached or every seat is out of funds
+        for _ in range(rounds):
+            result = self.play_round()
+            if result is None:
+                return
+            yield result
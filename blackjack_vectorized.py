@@ -0,0 +1,184 @@
+import numpy as np
+
+from CardGameLocal_FINAL import DEALER_STAND_VALUE, DECK_ORDER, TRANSITIONS, SOFT_FLAG
+from blackjack_rules import ORIGINAL
+from blackjack_strategy import StrategyTable, compile_strategy
+
+DECK_VALUES = np.array([card.points for card in DECK_ORDER], dtype=np.int8)  # Values of a 52-card deck, indexed by Card.code
+TRANSITION_TABLE = np.array(TRANSITIONS, dtype=np.int8)  # Next hand state at [state * 12 + card value]
+NATURAL = 21 | SOFT_FLAG  # Only an Ace and a ten-value card reach soft 21 in two cards
+
+class Shoes: # Deals from many independent shoes at once, one shoe per row
+
+    def __init__(self, rounds, decks, rng):
+        self.rng = rng
+        self.cards = np.tile(np.tile(DECK_VALUES, decks), (rounds, 1))  # Unshuffled card values, one row per shoe
+        self.size = self.cards.shape[1]
+        self.position = np.zeros(rounds, dtype=np.intp)  # Index of the next card to deal in each row
+
+    def deal(self, rows):
+        # Lazy Fisher-Yates: only the positions that are actually dealt get shuffled, which
+        # gives the same distribution as shuffling the whole shoe first
+        position = self.position[rows]
+        swap = self.rng.integers(position, self.size)
+        cards = self.cards[rows, swap]
+        self.cards[rows, swap] = self.cards[rows, position]
+        self.cards[rows, position] = cards
+        self.position[rows] = position + 1
+        return cards
+
+class PresetShoes: # Deals from shoes that are already shuffled, such as rows from blackjack_shuffle.shuffled_decks
+
+    def __init__(self, codes):
+        self.cards = DECK_VALUES[codes]  # Card codes to values in one lookup, no Card objects involved
+        self.position = np.zeros(len(codes), dtype=np.intp)
+
+    def deal(self, rows):
+        position = self.position[rows]
+        self.position[rows] = position + 1
+        return self.cards[rows, position]
+
+def add_cards(states, rows, cards):
+    # Vectorized FastHand.add_card: one table lookup per hand, no branches
+    states[rows] = TRANSITION_TABLE.take(states[rows].astype(np.intp) * 12 + cards)
+
+def settle(player_values, dealer_values):
+    # Vectorized settle_bet for a one-unit bet: 2 on a win, 1 on a tie, 0 on a loss or bust
+    win = (player_values <= 21) & ((dealer_values > 21) | (player_values > dealer_values))
+    tie = (player_values <= 21) & (player_values == dealer_values)
+    return 2 * win + tie
+
+def compile_policy(policy):
+    # Done once where a simulation starts: a hit threshold stays an integer, the cheapest test there
+    # is, and any other strategy compile_strategy takes becomes a StrategyTable
+    return policy if isinstance(policy, int) else compile_strategy(policy)
+
+def hit_mask(policy, states, upcards):
+    # policy is a hit threshold or a StrategyTable, as compile_policy leaves it; a table is looked up
+    # for every hand at once
+    if isinstance(policy, StrategyTable):
+        return policy.array()[states.astype(np.intp) * 12 + upcards].view(bool)
+    return (states & 31) < policy  # An integer policy hits below that value, like stand_on
+
+class BatchResult: # Per-round results of a batch simulation, one entry per round
+
+    def __init__(self, net, player_values, dealer_values):
+        self.net = net  # Net winnings for a one-unit bet: 1, 0 or -1 (fractions and doubles under extended rules)
+        self.player_values = player_values
+        self.dealer_values = dealer_values
+
+    def __len__(self):
+        return len(self.net)
+
+    def mean(self):
+        return float(self.net.mean())
+
+    def variance(self):
+        return float(self.net.var(ddof=1))
+
+    def stderr(self):
+        return (self.variance() / len(self.net)) ** 0.5
+
+def play_batch(rounds, policy, decks, rng, rules=ORIGINAL):
+    return play_shoes(Shoes(rounds, decks, rng), rounds, policy, rules)
+
+def play_decks(codes, policy=DEALER_STAND_VALUE, rules=ORIGINAL):
+    # Play one round from the top of each row of pre-shuffled card codes
+    return play_shoes(PresetShoes(np.asarray(codes)), len(codes), compile_policy(policy), rules)
+
+def dealer_turns(shoes, dealers, rows, rules):
+    # The dealer plays out every round, as in Game.dealer_turn
+    if rules.dealer_hits_soft_17:
+        dealer_hits = np.frombuffer(rules.dealer_hits, dtype=bool)
+        rows = rows[dealer_hits[dealers[rows]]]
+        while rows.size:
+            add_cards(dealers, rows, shoes.deal(rows))
+            rows = rows[dealer_hits[dealers[rows]]]
+        return
+    rows = rows[(dealers[rows] & 31) < DEALER_STAND_VALUE]
+    while rows.size:
+        add_cards(dealers, rows, shoes.deal(rows))
+        rows = rows[(dealers[rows] & 31) < DEALER_STAND_VALUE]
+
+def play_shoes(shoes, rounds, policy, rules=ORIGINAL):
+    if rules.extended:
+        return play_shoes_with_options(shoes, rounds, policy, rules)
+    every = np.arange(rounds)
+    players = np.zeros(rounds, dtype=np.int8)  # Hand states, see CardGameLocal_FINAL.TRANSITIONS
+    dealers = np.zeros(rounds, dtype=np.int8)
+
+    # Same dealing order as Game.initial_deal: two cards to the player, then two to the dealer
+    add_cards(players, every, shoes.deal(every))
+    add_cards(players, every, shoes.deal(every))
+    upcards = shoes.deal(every)
+    add_cards(dealers, every, upcards)
+    add_cards(dealers, every, shoes.deal(every))
+
+    rows = every[((players & 31) < 21) & hit_mask(policy, players, upcards)]
+    while rows.size:
+        add_cards(players, rows, shoes.deal(rows))
+        states = players[rows]
+        rows = rows[((states & 31) < 21) & hit_mask(policy, states, upcards[rows])]
+
+    dealer_turns(shoes, dealers, every, rules)
+
+    player_values, dealer_values = players & 31, dealers & 31
+    net = settle(player_values, dealer_values).astype(np.int8) - 1
+    return BatchResult(net, player_values, dealer_values)
+
+def play_shoes_with_options(shoes, rounds, policy, rules):
+    # play_shoes for rules with naturals, doubling or surrender, deciding from a StrategyTable. Splitting
+    # gives a round a varying number of hands, which these fixed per-round arrays cannot hold; use
+    # blackjack_engine.HeadlessGame for rules that allow it
+    if rules.split:
+        raise ValueError("The vectorized engine cannot split pairs; play these rules with blackjack_engine.HeadlessGame.")
+    table = compile_strategy(policy)
+    every = np.arange(rounds)
+    players = np.zeros(rounds, dtype=np.int8)
+    dealers = np.zeros(rounds, dtype=np.int8)
+    add_cards(players, every, shoes.deal(every))
+    add_cards(players, every, shoes.deal(every))
+    upcards = shoes.deal(every)
+    add_cards(dealers, every, upcards)
+    add_cards(dealers, every, shoes.deal(every))
+
+    naturals = (players == NATURAL) if rules.naturals else np.zeros(rounds, dtype=bool)
+    dealer_naturals = (dealers == NATURAL) if rules.naturals else np.zeros(rounds, dtype=bool)
+    first = players.astype(np.intp) * 12 + upcards  # Decisions on the first two cards
+    playing = ~naturals & ~dealer_naturals  # The dealer checks for a natural before anyone plays
+    surrendered = playing & table.array('surrenders')[first].view(bool) if rules.surrender else np.zeros(rounds, dtype=bool)
+    playing &= ~surrendered
+    doubled = playing & ((players & 31) < 21) & table.array('doubles')[first].view(bool) if rules.double else np.zeros(rounds, dtype=bool)
+    rows = every[doubled]
+    add_cards(players, rows, shoes.deal(rows))  # Exactly one more card on a doubled hand
+    playing &= ~doubled
+
+    rows = every[playing & ((players & 31) < 21) & hit_mask(table, players, upcards)]
+    while rows.size:
+        add_cards(players, rows, shoes.deal(rows))
+        states = players[rows]
+        rows = rows[((states & 31) < 21) & hit_mask(table, states, upcards[rows])]
+
+    dealer_turns(shoes, dealers, every, rules)
+
+    player_values, dealer_values = players & 31, dealers & 31
+    net = (settle(player_values, dealer_values) - 1.0) * np.where(doubled, 2, 1)
+    net[surrendered] = -0.5
+    if rules.naturals:
+        numerator, denominator = rules.blackjack_payout
+        net[naturals & ~dealer_naturals] = numerator / denominator
+    return BatchResult(net, player_values, dealer_values)
+
+def simulate_batch(rounds, policy=DEALER_STAND_VALUE, decks=None, seed=None, chunk_size=65536, rules=ORIGINAL):
+    # Play independent rounds, each from a freshly shuffled shoe, in chunks to keep memory bounded.
+    # decks defaults to the rules' deck count
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    decks = decks if decks is not None else rules.decks
+    policy = compile_policy(policy)
+    chunks = [play_batch(min(chunk_size, rounds - start), policy, decks, rng, rules) for start in range(0, rounds, chunk_size)]
+    if not chunks:
+        empty = np.zeros(0, dtype=np.int8)
+        return BatchResult(np.zeros(0, dtype=np.int8), empty, empty)
+    return BatchResult(np.concatenate([chunk.net for chunk in chunks]),
+                       np.concatenate([chunk.player_values for chunk in chunks]),
+                       np.concatenate([chunk.dealer_values for chunk in chunks]))
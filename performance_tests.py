@@ -1,27 +1,176 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
 import time
-import random
-from CardGameLocal_FINAL import Deck
 
-def fisher_yates_shuffle(deck):
-    # Fisher-Yates shuffle implementation
-    for i in range(len(deck) - 1, 0, -1):
-        j = random.randint(0, i)
-        deck[i], deck[j] = deck[j], deck[i]
+from CardGameLocal_FINAL import Card, Deck, Hand
+from blackjack_engine import HeadlessGame
+from blackjack_shuffle import make_shuffler
 
-def test_shuffle_performance():
-    # Initialize deck and perform the Fisher-Yates shuffle 1000 times
+# Each benchmark is a setup function returning (run, operations): run() performs the work once
+# and operations is how many units of work one call does, so results are reported per operation.
+
+BENCHMARKS = {}
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+@benchmark('deck_init')
+def bench_deck_init():
+    return (lambda: Deck()), 1
+
+@benchmark('shuffle')
+def bench_shuffle():
     deck = Deck()
-    shuffle_times = 1000
+    return deck.shuffle, 1
+
+@benchmark('shuffle_randint')
+def bench_shuffle_randint():
+    # The original random.randint Fisher-Yates, kept as a reference point
+    deck = Deck(shuffler=make_shuffler('randint'))
+    return deck.shuffle, 1
+
+@benchmark('deal')
+def bench_deal():
+    deck = Deck()
+    full = list(deck.cards)
+
+    def run():
+        deck.cards[:] = full  # Refill without allocating new cards
+        for _ in range(52):
+            deck.deal()
+    return run, 52
+
+@benchmark('hand_add_card')
+def bench_hand_add_card():
+    cards = [Card('Hearts', 'Ace'), Card('Spades', '7'), Card('Clubs', 'Ace'), Card('Diamonds', '9')]
+
+    def run():
+        hand = Hand()
+        for card in cards:
+            hand.add_card(card)
+    return run, len(cards)
+
+@benchmark('adjust_for_aces')
+def bench_adjust_for_aces():
+    hand = Hand()
+
+    def run():
+        hand.value, hand.aces = 32, 2
+        hand.adjust_for_aces()
+    return run, 1
+
+@benchmark('headless_round')
+def bench_headless_round():
+    game = HeadlessGame(1, 10 ** 12, seed=1)
+    return game.play_round, 1
+
+@benchmark('bulk_simulation')
+def bench_bulk_simulation():
+    from blackjack_vectorized import simulate_batch  # Needs NumPy
+    rounds = 100000
+    return (lambda: simulate_batch(rounds, seed=1)), rounds
+
+def calibrate(run, target):
+    # Find how many calls make one sample last about the target time
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= target or loops >= 10 ** 7:
+            return loops
+        loops = max(loops * 2, int(loops * target / max(elapsed, 1e-9)))
+
+def measure(setup, repeats, warmup, target):
+    run, operations = setup()
+    loops = calibrate(run, target)
+    for _ in range(warmup):
+        for _ in range(loops):
+            run()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        samples.append((time.perf_counter() - start) / (loops * operations))
+    quartiles = statistics.quantiles(samples, n=4) if len(samples) > 1 else [samples[0]] * 3
+    return {'median': statistics.median(samples), 'iqr': quartiles[2] - quartiles[0], 'min': min(samples),
+            'repeats': repeats, 'loops': loops, 'operations': operations}
+
+def run_suite(names, repeats=7, warmup=1, target=0.05):
+    results = {}
+    for name in names:
+        try:
+            results[name] = measure(BENCHMARKS[name], repeats, warmup, target)
+        except ImportError as error:
+            print(f"Skipping {name}: {error}", file=sys.stderr)
+    return results
+
+def compare(results, baseline, threshold):
+    # Return (name, baseline median, new median, ratio) for every benchmark slower than the threshold allows
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old:
+            ratio = result['median'] / old['median']
+            if ratio > 1 + threshold:
+                regressions.append((name, old['median'], result['median'], ratio))
+    return regressions
+
+def print_results(results, baseline=None):
+    print(f"{'Benchmark':<18}{'Median':>14}{'IQR':>14}{'Min':>14}{'vs baseline':>14}")
+    for name, result in results.items():
+        change = ''
+        if baseline and name in baseline:
+            change = f"{result['median'] / baseline[name]['median'] - 1:+.1%}"
+        print(f"{name:<18}{format_time(result['median']):>14}{format_time(result['iqr']):>14}"
+              f"{format_time(result['min']):>14}{change:>14}")
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Blackjack hot paths.")
+    parser.add_argument('names', nargs='*', help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument('--repeats', type=int, default=7, help="timed samples per benchmark")
+    parser.add_argument('--warmup', type=int, default=1, help="untimed samples before measuring")
+    parser.add_argument('--target', type=float, default=0.05, help="approximate seconds per sample")
+    parser.add_argument('--json', metavar='PATH', help="write the results to a JSON file")
+    parser.add_argument('--compare', metavar='BASELINE', help="compare against a JSON file written by --json")
+    parser.add_argument('--threshold', type=float, default=0.10, help="slowdown treated as a regression (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    results = run_suite(args.names or list(BENCHMARKS), args.repeats, args.warmup, args.target)
 
-    # We will directly shuffle the list of cards in the Deck instance
-    deck_list = deck.cards
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)['results']
+    print_results(results, baseline)
 
-    start_time = time.time()
-    for _ in range(shuffle_times):
-        fisher_yates_shuffle(deck_list)
-    end_time = time.time()
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'results': results}, file, indent=2)
 
-    print(f"Time taken to shuffle a 52-card deck {shuffle_times} times using Fisher-Yates: {end_time - start_time:.6f} seconds")
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        for name, old, new, ratio in regressions:
+            print(f"REGRESSION {name}: {format_time(old)} -> {format_time(new)} ({ratio - 1:+.1%})")
+        return 1 if regressions else 0
+    return 0
 
 if __name__ == "__main__":
-    test_shuffle_performance()
+    sys.exit(main())
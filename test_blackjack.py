@@ -1,5 +1,35 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import pickle
+import random
+import tempfile
 import unittest
-from CardGameLocal_FINAL import Card, Hand
+from collections import Counter
+from fractions import Fraction
+
+import blackjack_metrics
+import performance_tests
+from blackjack_adaptive import run_until, CONVERGED, OUT_OF_TIME
+from blackjack_bankroll import Bankrolls, ProportionalBets, CountBets, risk_of_ruin
+from blackjack_checkpoint import Checkpointer, read_checkpoint, resume
+from blackjack_compare import compare, compare_many
+from blackjack_engine import HeadlessGame, simulate, stand_on, flat_bet, WIN, TIE, LOSS, BUST
+from blackjack_log import HandLogWriter, read_log, iter_chunks, check_header
+from blackjack_output import ConsoleSink, BufferedSink, RecordingSink, NullSink, render
+from blackjack_parallel import run_parallel
+from blackjack_probability import dealer_outcomes, dealer_bust_chance, shoe_composition, remove_cards, shoe_outcomes
+from blackjack_replay import Replayer, ReplayError, verify_log
+from blackjack_rules import Rules, HOUSE_RULES
+from blackjack_server import Server
+from blackjack_shuffle import BufferedShuffler, make_shuffler, shuffled_decks, iter_decks, shoe_tops
+from blackjack_stats import RunningStats, Aggregate
+from blackjack_strategy import StrategyTable, solve, solved_hits, expected_value, compile_strategy
+from blackjack_tables import Tables
+from blackjack_vectorized import simulate_batch, play_decks
+from CardGameLocal_FINAL import Card, Deck, Shoe, Hand, FastHand, Game, settle_bet, card_from_code, DECK_ORDER
 
 class TestHand(unittest.TestCase):
     
@@ -52,5 +82,839 @@ class TestHand(unittest.TestCase):
 
         self.assertEqual(self.hand.value, 23, "Hand value should be 23 after adding 10, 8, and 5.")
 
+class TestFastHand(unittest.TestCase):
+
+    def test_matches_hand_for_random_deals(self):
+        rng = random.Random(5)
+        for _ in range(2000):
+            hand, fast = Hand(), FastHand()
+            while hand.value <= 21:
+                card = rng.choice(DECK_ORDER)
+                hand.add_card(card)
+                fast.add_card(card)
+                self.assertEqual((fast.value, fast.aces), (hand.value, hand.aces), "FastHand should score exactly like Hand.")
+                self.assertEqual(fast.is_bust(), hand.value > 21)
+
+    def test_flags(self):
+        hand = FastHand()
+        hand.add_card(Card('Spades', 'Ace'))
+        hand.add_card(Card('Hearts', 'King'))
+        self.assertTrue(hand.is_blackjack(), "An Ace and a King should be a blackjack.")
+        self.assertTrue(hand.is_soft())
+        hand.add_card(Card('Hearts', '5'))
+        self.assertEqual(hand.value, 16, "The Ace should drop to 1 once the hand would bust.")
+        self.assertFalse(hand.is_soft())
+        self.assertFalse(hand.is_blackjack())
+
+class TestCard(unittest.TestCase):
+
+    def test_cards_are_interned(self):
+        self.assertIs(Card('Hearts', 'King'), Card('Hearts', 'King'), "Equal cards should be the same shared object.")
+        self.assertIs(pickle.loads(pickle.dumps(Card('Spades', 'Ace'))), Card('Spades', 'Ace'))
+
+    def test_values_and_codes(self):
+        self.assertEqual(Card('Clubs', 'Queen').get_value(), 10)
+        self.assertEqual(Card('Clubs', 'Ace').get_value(), 11)
+        self.assertEqual(Card('Clubs', '7').get_value(), 7)
+        self.assertEqual(repr(Card('Diamonds', '10')), "10 of Diamonds")
+        for code in range(52):
+            self.assertEqual(card_from_code(code).code, code)
+
+    def test_deck_shares_cards(self):
+        self.assertEqual(sorted(card.code for card in Deck().cards), list(range(52)), "A deck should hold each card once.")
+
+class TestShoe(unittest.TestCase):
+
+    def test_multi_deck_composition(self):
+        shoe = Shoe(decks=6)
+        self.assertEqual(len(shoe.cards), 312)
+        self.assertEqual(sum(card.is_ace for card in shoe.cards), 24, "Six decks should hold 24 Aces.")
+
+    def test_reshuffles_at_cut_card_in_place(self):
+        shoe = Shoe(decks=2, penetration=0.5)
+        storage = shoe.cards
+        for _ in range(51):
+            shoe.deal()
+        self.assertFalse(shoe.check_cut_card(), "The shoe should not reshuffle before the cut card.")
+        shoe.deal()
+        self.assertTrue(shoe.check_cut_card(), "The shoe should reshuffle once the cut card is reached.")
+        self.assertEqual(shoe.cards_remaining(), 104)
+        self.assertIs(shoe.cards, storage, "Reshuffling should reuse the same card storage.")
+
+    def test_never_runs_dry(self):
+        shoe = Shoe()
+        dealt = [shoe.deal() for _ in range(52 * 3)]
+        self.assertEqual(len(dealt), 156, "Dealing past the end should reshuffle instead of raising.")
+
+    def test_deck_still_raises_when_empty(self):
+        deck = Deck()
+        for _ in range(52):
+            deck.deal()
+        self.assertRaises(ValueError, deck.deal)
+
+class TestCounting(unittest.TestCase):
+
+    def test_counts_follow_the_deal(self):
+        shoe = Shoe(decks=2, rng=random.Random(6))
+        dealt = [shoe.deal() for _ in range(40)]
+        expected = sum((1 if card.points <= 6 else -1 if card.points >= 10 else 0) for card in dealt)
+        self.assertEqual(shoe.running_count, expected, "The Hi-Lo running count should match the cards dealt.")
+        self.assertEqual(sum(shoe.rank_counts), 64)
+        self.assertEqual(shoe.rank_counts[12], 8 - sum(card.is_ace for card in dealt))
+        self.assertAlmostEqual(shoe.true_count(), expected / (64 / 52))
+
+    def test_recount_matches_incremental_updates(self):
+        deck = Deck(random.Random(2), counting='zen')
+        for _ in range(30):
+            deck.deal()
+        counts, running = list(deck.rank_counts), deck.running_count
+        deck.recount()
+        self.assertEqual((deck.rank_counts, deck.running_count), (counts, running))
+
+    def test_reset_on_shuffle_and_composition(self):
+        shoe = Shoe(decks=6)
+        for _ in range(100):
+            shoe.deal()
+        shoe.shuffle()
+        self.assertEqual(shoe.running_count, 0, "A fresh shoe should start with a zero count.")
+        self.assertEqual(shoe.composition(), shoe_composition(6))
+
+class TestShuffle(unittest.TestCase):
+
+    def test_buffered_shuffle_is_uniform(self):
+        shuffler = BufferedShuffler(random.Random(2), buffer_size=64)
+        counts = Counter()
+        for _ in range(60000):
+            cards = [0, 1, 2]
+            shuffler.shuffle(cards)
+            counts[tuple(cards)] += 1
+        self.assertEqual(len(counts), 6, "Every ordering of three cards should appear.")
+        for count in counts.values():
+            self.assertLess(abs(count - 10000), 500, "Each ordering should be equally likely.")
+
+    def test_backends_keep_every_card(self):
+        for backend in ['buffered', 'numpy', 'randint']:
+            deck = Deck(shuffler=make_shuffler(backend, rng=3))
+            self.assertEqual(sorted(card.code for card in deck.cards), list(range(52)), backend)
+
+    def test_seeded_decks_are_reproducible(self):
+        self.assertEqual(Deck(random.Random(8)).cards, Deck(random.Random(8)).cards)
+
+class TestBatchShuffle(unittest.TestCase):
+
+    def test_rows_are_whole_shoes(self):
+        decks = shuffled_decks(100, decks=2, rng=1)
+        self.assertEqual(decks.shape, (100, 104))
+        for row in decks[:10]:
+            self.assertEqual(sorted(row.tolist()), sorted(list(range(52)) * 2))
+
+    def test_iterator_and_batch_shuffler(self):
+        stream = iter_decks(batch=3, rng=2)
+        rows = [next(stream) for _ in range(7)]
+        self.assertEqual(len({tuple(row.tolist()) for row in rows}), 7, "Each shoe from the stream should be freshly shuffled.")
+        shoe = Shoe(decks=2, shuffler=make_shuffler('batch', rng=4))
+        shoe.shuffle()
+        self.assertEqual(sorted(card.code for card in shoe.cards), sorted(list(range(52)) * 2))
+
+    def test_shoe_tops(self):
+        tops = shoe_tops(20000, decks=2, depth=30, rng=5)
+        self.assertEqual(tops.shape, (20000, 30))
+        self.assertTrue(all(max(Counter(row).values()) <= 2 for row in tops[:200].tolist()), "A card can appear at most once per deck.")
+        counts = Counter(tops[:, 29].tolist())
+        self.assertEqual(len(counts), 52)
+        self.assertLess(max(counts.values()) - min(counts.values()), 200, "Every card should be equally likely at any depth.")
+
+    def test_play_preshuffled_decks(self):
+        ten, nine, seven = Card('Hearts', '10').code, Card('Hearts', '9').code, Card('Spades', '7').code
+        result = play_decks([[ten, nine, ten, seven], [ten, seven, ten, nine]])
+        self.assertEqual(result.net.tolist(), [1, -1], "19 against 17 should win and 17 against 19 should lose.")
+
+class TestSettleBet(unittest.TestCase):
+
+    def test_outcomes(self):
+        self.assertEqual(settle_bet(20, 18, 5), 10, "A win should pay back double the bet.")
+        self.assertEqual(settle_bet(18, 22, 5), 10, "A dealer bust should pay back double the bet.")
+        self.assertEqual(settle_bet(19, 19, 5), 5, "A tie should return the bet.")
+        self.assertEqual(settle_bet(17, 20, 5), 0, "A loss should pay nothing.")
+        self.assertEqual(settle_bet(22, 23, 5), 0, "A player bust loses even if the dealer busts too.")
+
+class TestHeadlessGame(unittest.TestCase):
+
+    def test_same_seed_same_results(self):
+        first = simulate(200, players=3, seed=42)
+        second = simulate(200, players=3, seed=42)
+        self.assertEqual(first, second, "A seeded session should be reproducible.")
+
+    def test_funds_match_results(self):
+        game = HeadlessGame(2, 1000, strategy=stand_on(15), seed=7)
+        results = list(game.play_rounds(300))
+        for player in game.players:
+            net = sum(seat.net for result in results for seat in result.seats if seat.seat == player['seat'])
+            self.assertEqual(player['funds'], 1000 + net, "Funds should equal starting funds plus the net of every round.")
+
+    def test_results_follow_the_rules(self):
+        for result in simulate(500, players=2, seed=3):
+            self.assertGreaterEqual(result.dealer_value, 17, "The dealer should never stand below 17.")
+            for seat in result.seats:
+                if seat.value > 21:
+                    self.assertEqual(seat.outcome, BUST)
+                elif result.dealer_value > 21 or seat.value > result.dealer_value:
+                    self.assertEqual(seat.outcome, WIN)
+                elif seat.value == result.dealer_value:
+                    self.assertEqual(seat.outcome, TIE)
+                else:
+                    self.assertEqual(seat.outcome, LOSS)
+
+    def test_stops_when_players_are_out_of_funds(self):
+        game = HeadlessGame(1, 3, strategy=stand_on(22), seed=1)  # Always hitting to 21 or bust loses quickly
+        results = list(game.play_rounds(10000))
+        self.assertLess(len(results), 10000, "The session should end once every player is out of funds.")
+        self.assertEqual(game.players, [], "Players with no funds left should be removed.")
+
+class TestVectorizedSimulation(unittest.TestCase):
+
+    def test_same_seed_same_results(self):
+        first = simulate_batch(5000, seed=11)
+        second = simulate_batch(5000, seed=11)
+        self.assertTrue((first.net == second.net).all(), "A seeded batch should be reproducible.")
+
+    def test_results_follow_the_rules(self):
+        result = simulate_batch(20000, policy=15, seed=4, chunk_size=3000)
+        self.assertEqual(len(result), 20000)
+        self.assertTrue((result.dealer_values >= 17).all(), "The dealer should never stand below 17.")
+        self.assertTrue((result.player_values >= 15).all(), "The player should hit until reaching 15.")
+        for net, player, dealer in zip(result.net[:2000], result.player_values[:2000], result.dealer_values[:2000]):
+            self.assertEqual(net, settle_bet(int(player), int(dealer), 1) - 1)
+
+    def test_callable_policy_matches_threshold(self):
+        threshold = simulate_batch(5000, policy=16, seed=9)
+        callable_policy = simulate_batch(5000, policy=lambda totals, soft, upcards: totals < 16, seed=9)
+        self.assertTrue((threshold.net == callable_policy.net).all())
+
+class TestRunningStats(unittest.TestCase):
+
+    def test_merge_matches_single_pass(self):
+        values = [(-1) ** i * (i % 7) for i in range(101)]
+        whole = RunningStats()
+        for value in values:
+            whole.add(value)
+        left, right = RunningStats(), RunningStats()
+        for value in values[:40]:
+            left.add(value)
+        for value in values[40:]:
+            right.add(value)
+        left.merge(right)
+        self.assertEqual(left.count, whole.count)
+        self.assertAlmostEqual(left.mean, whole.mean)
+        self.assertAlmostEqual(left.variance(), whole.variance())
+
+class TestAggregate(unittest.TestCase):
+
+    def test_drawdown(self):
+        stats = Aggregate()
+        for net in (1, 1, -3, 2, -1):
+            stats.add(net)
+        self.assertEqual((stats.total, stats.peak, stats.low, stats.max_drawdown), (0, 2, -1, 3))
+
+    def test_ordered_merge_is_exact(self):
+        results = simulate(2000, players=3, seed=6)
+        whole = Aggregate()
+        for result in results:
+            whole.add_round(result)
+        merged = Aggregate()
+        for start in range(0, 2000, 300):
+            part = Aggregate()
+            for result in results[start:start + 300]:
+                part.add_round(result)
+            merged.merge(part)
+        for name in ('count', 'outcomes', 'total', 'peak', 'low', 'max_drawdown', 'player_totals', 'dealer_totals'):
+            self.assertEqual(getattr(merged, name), getattr(whole, name), f"Merged {name} should match a single pass.")
+        self.assertAlmostEqual(merged.variance(), whole.variance())
+        self.assertAlmostEqual(sum(whole.rates().values()), 1.0)
+
+    def test_batch_matches_one_at_a_time(self):
+        batch = simulate_batch(5000, seed=3)
+        vectorized, single = Aggregate(), Aggregate()
+        vectorized.add_batch(batch)
+        for net in batch.net.tolist():
+            single.add(net)
+        self.assertEqual((vectorized.total, vectorized.peak, vectorized.low, vectorized.max_drawdown),
+                         (single.total, single.peak, single.low, single.max_drawdown))
+        self.assertEqual(sum(vectorized.player_totals), 5000)
+
+class TestCompare(unittest.TestCase):
+
+    def test_identical_strategies(self):
+        comparison = compare(17, 17, 20000, seed=1)
+        self.assertEqual((comparison.difference.mean, comparison.difference.variance()), (0.0, 0.0),
+                         "The same strategy on the same shoes should give exactly the same results.")
+
+    def test_paired_difference(self):
+        comparison = compare(17, 16, 100000, decks=6, seed=2)
+        self.assertAlmostEqual(comparison.difference.mean, comparison.first.mean - comparison.second.mean)
+        low, high = comparison.interval()
+        self.assertLess(low, comparison.difference.mean)
+        self.assertLess(comparison.difference.mean, high)
+        self.assertGreater(comparison.variance_reduction(), 4, "Common shoes should cancel most of the noise.")
+
+    def test_antithetic_pairs(self):
+        comparison = compare(17, 15, 30000, seed=3, antithetic=True, chunk_size=7000)
+        self.assertEqual(comparison.difference.count, 30000, "Each shoe and its mirror should count as one observation.")
+        plain = compare(17, 13, 100000, decks=6, seed=4)
+        paired = compare(17, 13, 100000, decks=6, seed=4, antithetic=True)
+        # A pair of independent shoes would halve the variance; mirrored shoes should do better than that
+        self.assertLess(paired.difference.variance(), 0.9 * plain.difference.variance() / 2)
+
+class TestAdaptiveSimulation(unittest.TestCase):
+
+    def test_stops_at_target(self):
+        result = run_until(0.005, seed=1, first_batch=2000)
+        self.assertEqual(result.reason, CONVERGED)
+        self.assertLessEqual(result.stats.stderr(), 0.005)
+        self.assertLess(result.stats.count, 80000, "Batches should be sized from the variance, not grown blindly.")
+
+    def test_limits(self):
+        self.assertEqual(run_until(0.0001, seed=2, max_hands=30000).stats.count, 30000)
+        result = run_until(0.00001, seed=3, time_budget=0.0)
+        self.assertEqual((result.reason, result.batches), (OUT_OF_TIME, 1), "Only the first batch should run without any time.")
+
+    def test_headless_mode(self):
+        result = run_until(0.05, mode='headless', players=2, seed=4, first_batch=500)
+        self.assertEqual(result.reason, CONVERGED)
+        self.assertRaises(ValueError, run_until, 0)
+
+class TestParallelSimulation(unittest.TestCase):
+
+    def test_same_seed_and_workers_same_results(self):
+        first = run_parallel(20000, workers=2, seed=123)
+        second = run_parallel(20000, workers=2, seed=123)
+        self.assertEqual(first.count, 20000)
+        self.assertEqual((first.mean, first.m2, first.outcomes), (second.mean, second.m2, second.outcomes))
+
+    def test_unseeded_run_can_be_repeated(self):
+        first = run_parallel(20000, workers=2)
+        second = run_parallel(20000, workers=2, seed=first.seed)
+        self.assertEqual(second.seed, first.seed)
+        self.assertEqual((first.mean, first.m2, first.outcomes), (second.mean, second.m2, second.outcomes))
+
+    def test_headless_mode(self):
+        stats = run_parallel(300, workers=2, seed=5, mode='headless', players=2)
+        self.assertEqual(stats.count, 600, "Every seat of every round should be counted.")
+        self.assertEqual(sum(stats.outcomes.values()), 600)
+
+class TestMetrics(unittest.TestCase):
+
+    def tearDown(self):
+        blackjack_metrics.disable()
+        blackjack_metrics.reset()
+
+    def test_disabled_methods_are_untouched(self):
+        blackjack_metrics.disable()
+        self.assertFalse(hasattr(Hand.add_card, '__wrapped__'), "Disabled instrumentation should leave the original method in place.")
+
+    def test_enabled_methods_are_counted(self):
+        blackjack_metrics.reset()
+        blackjack_metrics.enable()
+        hand = Hand()
+        hand.add_card(Card('Hearts', '9'))
+        hand.add_card(Card('Spades', 'Ace'))
+        rows = {key: (calls, total) for key, calls, total, average in blackjack_metrics.report()}
+        self.assertEqual(rows['Hand.add_card'][0], 2, "Each call should be counted.")
+        self.assertEqual(rows['Hand.__init__'][0], 1)
+        self.assertGreaterEqual(rows['Hand.add_card'][1], 0.0)
+        self.assertEqual(hand.value, 20, "Timing should not change behaviour.")
+
+    def test_shoe_shuffle_counted_once(self):
+        blackjack_metrics.reset()
+        blackjack_metrics.enable()
+        Shoe(2)
+        calls = {key: count for key, count, total, average in blackjack_metrics.report()}
+        self.assertEqual(calls.get('Shoe.shuffle'), 1)
+        self.assertNotIn('Deck.shuffle', calls, "A shoe shuffle should not also be timed as a deck shuffle.")
+
+class TestDealerProbabilities(unittest.TestCase):
+
+    def test_distributions_sum_to_one(self):
+        for upcard in range(2, 12):
+            self.assertAlmostEqual(sum(dealer_outcomes(upcard)), 1.0)
+            self.assertAlmostEqual(sum(dealer_outcomes(upcard, remove_cards(shoe_composition(1), upcard))), 1.0)
+
+    def test_known_infinite_deck_values(self):
+        self.assertAlmostEqual(dealer_bust_chance(6), 0.4232, places=4, msg="A dealer showing 6 busts about 42.3% of the time.")
+        self.assertAlmostEqual(dealer_bust_chance(11), 0.1153, places=4)
+
+    def test_exact_for_a_known_shoe(self):
+        only_tens = (0, 0, 0, 0, 0, 0, 0, 0, 8, 0)
+        self.assertEqual(dealer_outcomes(7, only_tens), (1.0, 0.0, 0.0, 0.0, 0.0, 0.0), "7 and a ten should always stand on 17.")
+        self.assertEqual(dealer_bust_chance(6, only_tens), 1.0, "6, a ten and another ten should always bust.")
+
+    def test_cache_stays_bounded(self):
+        shoe = shoe_composition(1)
+        for fives in range(4):
+            dealer_outcomes(6, remove_cards(shoe, *(5,) * fives))
+        info = shoe_outcomes.cache_info()
+        self.assertIsNotNone(info.maxsize, "Answers for every shoe ever seen should not be kept.")
+        self.assertLessEqual(info.currsize, info.maxsize)
+
+class TestStrategySolver(unittest.TestCase):
+
+    def test_basic_strategy_decisions(self):
+        table = solve()
+        self.assertTrue(table(16, False, 10), "Hard 16 should hit against a 10.")
+        self.assertFalse(table(16, False, 6), "Hard 16 should stand against a 6.")
+        self.assertTrue(table(12, False, 2), "Hard 12 should hit against a 2.")
+        self.assertFalse(table(13, False, 2), "Hard 13 should stand against a 2.")
+        self.assertTrue(table(17, True, 7), "Soft 17 should hit.")
+        self.assertFalse(table(17, False, 11), "Hard 17 should stand.")
+
+    def test_solution_beats_mimicking_the_dealer(self):
+        mimic = StrategyTable()
+        for value in range(22):
+            for upcard in range(2, 12):
+                mimic.set(value, False, upcard, value < 17)
+                mimic.set(value, True, upcard, value < 17)
+        self.assertGreater(expected_value(solve()), expected_value(mimic))
+
+    def test_composition_solution_is_cached(self):
+        shoe = shoe_composition(6)
+        self.assertIs(solved_hits(tuple(shoe)), solved_hits(tuple(shoe)), "Solving the same shoe twice should reuse the cached solution.")
+        table = solve(shoe)
+        table.set(16, False, 10, False)
+        self.assertTrue(solve(shoe)(16, False, 10), "Changing a solved table should not change later solutions.")
+
+    def test_upcard_leaves_the_players_draws(self):
+        # One Ace and eight tens, never hitting. Under the Ace (1/9) the player can only draw 20 and loses to 21;
+        # under a ten the player and dealer both draw from one Ace and seven tens, worth 41/512
+        self.assertAlmostEqual(expected_value(StrategyTable(), (0, 0, 0, 0, 0, 0, 0, 0, 8, 1)), -1 / 9 + 8 / 9 * 41 / 512)
+
+    def test_table_drives_the_headless_engine(self):
+        results = simulate(50, strategy=solve(), seed=1)
+        self.assertEqual(len(results), 50)
+
+class TestStrategyCompilation(unittest.TestCase):
+
+    def test_compiled_callable_decides_identically(self):
+        cautious = lambda value, soft, upcard: value < (17 if soft or upcard >= 7 else 12)
+        table = compile_strategy(cautious)
+        for value in range(4, 21):
+            for soft in ((False, True) if value >= 12 else (False,)):
+                for upcard in range(2, 12):
+                    self.assertEqual(bool(table(value, soft, upcard)), cautious(value, soft, upcard), "A compiled table should decide like its callable.")
+        self.assertEqual(compile_strategy(stand_on(15)), compile_strategy(15))
+        with_hand = [result.seats for result in simulate(300, players=2, strategy=table, seed=3, hand_class=Hand)]
+        self.assertEqual(with_hand, [result.seats for result in simulate(300, players=2, strategy=table, seed=3)])
+
+    def test_declarative_formats(self):
+        best = solve()
+        from_chart = [result.seats for result in simulate(300, strategy=best.chart(), seed=4)]
+        self.assertEqual(from_chart, [result.seats for result in simulate(300, strategy=best, seed=4)], "A chart should round-trip.")
+        table = compile_strategy({'hard': {16: 'SSSSS HHHHH'}, 'soft': {18: 'SSSSSSSHHH'}}, default=12)
+        self.assertEqual((table(16, False, 6), table(16, False, 7), table(18, True, 11), table(13, False, 2)), (False, True, True, False))
+        self.assertRaises(ValueError, compile_strategy, {'hard': {16: 'SSH'}})
+
+    def test_vectorized_lookup(self):
+        a = simulate_batch(20000, policy=15, seed=5)
+        b = simulate_batch(20000, policy=compile_strategy(15), seed=5)
+        self.assertEqual(a.net.tolist(), b.net.tolist(), "A threshold table should play like the threshold.")
+        ranked = compare_many([solve(), 17, 12], 50000, decks=6, seed=6)
+        self.assertEqual(max(range(3), key=lambda index: ranked[index].mean), 0, "The solved strategy should come out on top.")
+
+    def test_every_vectorized_engine_compiles(self):
+        cautious = lambda value, soft, upcard: value < (17 if soft else 12)
+        for strategy in (solve().chart(), {'hard': {16: 'SSSSSHHHHH'}}, cautious):
+            table = compile_strategy(strategy)
+            self.assertEqual(simulate_batch(5000, strategy, seed=7).net.tolist(), simulate_batch(5000, table, seed=7).net.tolist())
+            by_strategy, by_table = Tables(20, 3, 100, policy=strategy, seed=8), Tables(20, 3, 100, policy=table, seed=8)
+            for first, second in zip(by_strategy.play_rounds(10), by_table.play_rounds(10)):
+                self.assertEqual(first.net.tolist(), second.net.tolist(), "Tables should play a strategy like its table.")
+            self.assertEqual(compare(strategy, table, 2000, seed=9).difference.mean, 0)
+
+class TestRules(unittest.TestCase):
+
+    CHART = {'hard': {11: 'DDDDDDDDDD', 16: 'SSSSSHHRRR'}, 'soft': {18: 'SDDDDSSHHH'}, 'pair': {8: 'PPPPPPPPPP', 11: 'PPPPPPPPPP'}}
+
+    def test_settlement(self):
+        rules = Rules(blackjack_payout=(3, 2), surrender=True)
+        self.assertEqual(rules.settle(21, 20, 2, natural=True), 5, "A natural should pay 3:2.")
+        self.assertEqual(rules.settle(21, 20, 1, natural=True), 2.5)
+        self.assertEqual(sum(Rules(blackjack_payout=(6, 5)).natural_payout(1) for _ in range(10)), 22, "Payouts should be exact.")
+        self.assertEqual(rules.settle(21, 21, 2, dealer_natural=True), 0, "A dealer natural should beat a drawn 21.")
+        self.assertEqual(rules.settle(21, 21, 2, natural=True, dealer_natural=True), 2, "Two naturals should push.")
+        self.assertEqual(rules.settle(16, 20, 4, surrendered=True), 2, "Surrender should return half the bet.")
+        self.assertEqual(Rules(blackjack_payout=(6, 5)).settle(21, 18, 5, natural=True), 11)
+        self.assertEqual(Rules().settle(21, 20, 3), settle_bet(21, 20, 3))
+        self.assertRaises(ValueError, Rules, decks=0)
+
+    def test_hashing(self):
+        self.assertEqual(len({Rules(), Rules(decks=1), HOUSE_RULES['original'], Rules(decks=6)}), 2, "Equal rules should hash alike.")
+        self.assertRaises(TypeError, hash, StrategyTable())
+
+    def test_dealer_soft_17(self):
+        for hand_class in (FastHand, Hand):
+            for hits in (False, True):
+                game = HeadlessGame(1, 100, seed=1, hand_class=hand_class, rules=Rules(dealer_hits_soft_17=hits))
+                game.dealer = hand_class()
+                game.dealer.add_card(Card('Spades', 'Ace'))
+                game.dealer.add_card(Card('Hearts', '6'))
+                game.dealer_turn()
+                self.assertEqual(len(game.dealer.cards) > 2, hits, "Only an H17 dealer should hit soft 17.")
+
+    def test_options_keep_funds_balanced(self):
+        for name, rules in HOUSE_RULES.items():
+            game = HeadlessGame(3, 1000, strategy=self.CHART, seed=7, rules=rules)
+            seats = [seat for result in game.play_rounds(500) for seat in result.seats]
+            self.assertEqual(sum(seat.net for seat in seats), sum(player['funds'] for player in game.players) - 3000, name)
+            if rules.split:
+                self.assertGreater(len(seats), 1500, "Split hands should each be settled.")
+            if rules.double:
+                self.assertTrue(any(seat.bet == 2 for seat in seats), "Doubled hands should carry twice the bet.")
+        self.assertEqual(compile_strategy(compile_strategy(self.CHART).chart()), compile_strategy(self.CHART), "A chart should round-trip.")
+
+    def test_logs_refuse_other_rules(self):
+        with tempfile.TemporaryDirectory() as directory, HandLogWriter(os.path.join(directory, 'hands.log')) as log:
+            self.assertRaises(ValueError, HeadlessGame, 1, 100, recorder=log, rules=Rules(dealer_hits_soft_17=True))
+            self.assertRaises(ValueError, HeadlessGame, 1, 100, recorder=log, rules=Rules(double=True))
+            HeadlessGame(1, 100, recorder=log, rules=Rules())
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'hands.log')
+            with HandLogWriter(path, decks=6) as log:
+                simulate(50, seed=3, recorder=log, rules=Rules(decks=6))
+            self.assertEqual(verify_log(path), [], "Only the deck count differs, and the log records it.")
+
+    def test_bets_are_whole_units(self):
+        game = HeadlessGame(1, Fraction(7, 2), bet_strategy=flat_bet(10), seed=2)
+        game.collect_bets()
+        self.assertEqual((game.players[0]['bet'], game.players[0]['funds']), (3, Fraction(1, 2)))
+
+    def test_checkpoints_refuse_fractional_payouts(self):
+        with tempfile.TemporaryDirectory() as directory, Checkpointer(os.path.join(directory, 'game.ckpt')) as checkpoints:
+            checkpoints.save(HeadlessGame(1, 100, seed=1, rules=Rules(dealer_hits_soft_17=True, blackjack_payout=(1, 1))))
+            game = HeadlessGame(1, 100, seed=1, rules=HOUSE_RULES['vegas-strip'])
+            self.assertRaises(ValueError, checkpoints.save, game)
+
+    def test_vectorized_rules(self):
+        table = compile_strategy(self.CHART)
+        rules = Rules(dealer_hits_soft_17=True, blackjack_payout=(3, 2), double=True, surrender=True)
+        result = simulate_batch(50000, table, seed=8, rules=rules)
+        self.assertEqual(set(result.net.tolist()), {-2, -1, -0.5, 0, 1, 1.5, 2})
+        self.assertRaises(ValueError, simulate_batch, 10, table, rules=HOUSE_RULES['vegas-strip'])
+        codes = shoe_tops(20000, 6, 56, rng=9)
+        stands, hits = play_decks(codes, 17), play_decks(codes, 17, Rules(dealer_hits_soft_17=True))
+        self.assertLess((hits.dealer_values == 17).sum(), (stands.dealer_values == 17).sum(), "An H17 dealer should finish on 17 less often.")
+
+class TestServer(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.server = await Server(action_timeout=0.2, seed=1).start(port=0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def connect(self, players):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        writer.write(json.dumps({'action': 'join', 'players': players, 'funds': 50}).encode() + b'\n')
+        return reader, writer
+
+    async def receive(self, reader):
+        return json.loads(await reader.readline())
+
+    async def test_play_a_round(self):
+        reader, writer = await self.connect(2)
+        self.assertEqual((await self.receive(reader))['event'], 'table')
+        while True:
+            message = await self.receive(reader)
+            if message['event'] == 'bet':
+                writer.write(b'{"action": "bet", "amount": 5}\n')
+            elif message['event'] == 'turn':
+                writer.write(b'{"action": "stand"}\n')
+            elif message['event'] == 'result':
+                break
+        self.assertEqual(len(message['seats']), 2)
+        for seat in message['seats']:
+            self.assertEqual(seat['funds'], 45 + seat['payout'], "Funds should reflect the bet and the payout.")
+        writer.write(b'{"action": "quit"}\n')
+        writer.close()
+
+    async def test_unanswered_prompts_use_defaults(self):
+        reader, writer = await self.connect(1)
+        events = []
+        while not events or events[-1]['event'] != 'result':
+            events.append(await self.receive(reader))
+        timeouts = [event['prompt'] for event in events if event['event'] == 'timeout']
+        self.assertEqual(timeouts[0], 'bet', "An unanswered bet should time out.")
+        self.assertEqual(events[-1]['seats'][0]['bet'], 1, "The default bet should be the minimum of 1.")
+        writer.close()
+
+    async def test_overlong_line_closes_the_table(self):
+        reader, writer = await self.connect(1)
+        self.assertEqual((await self.receive(reader))['event'], 'table')
+        self.assertEqual((await self.receive(reader))['event'], 'bet')
+        writer.write(b'{"action": "bet", "amount": "' + b'9' * (1 << 17) + b'"}\n')
+        self.assertEqual((await self.receive(reader))['event'], 'error')
+        self.assertEqual(await reader.read(), b'', "The server should close the connection.")
+        writer.close()
+
+    async def test_many_tables_at_once(self):
+        async def play_one():
+            reader, writer = await self.connect(1)
+            while True:
+                message = await self.receive(reader)
+                if message['event'] == 'bet':
+                    writer.write(b'{"action": "bet", "amount": 1}\n')
+                elif message['event'] == 'turn':
+                    writer.write(b'{"action": "hit"}\n')
+                elif message['event'] == 'result':
+                    writer.write(b'{"action": "quit"}\n')
+                    writer.close()
+                    return message['seats'][0]['outcome']
+        outcomes = await asyncio.gather(*(play_one() for _ in range(50)))
+        self.assertEqual(len(outcomes), 50)
+
+class TestHandLog(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'hands.bjl')
+
+    def test_round_trip(self):
+        with HandLogWriter(self.path, buffer_size=256) as log:
+            game = HeadlessGame(2, 1000, strategy=stand_on(16), seed=12, recorder=log)
+            results = list(game.play_rounds(300))
+        records = read_log(self.path)
+        self.assertEqual(len(records), 600, "There should be one record per seat per round.")
+        for record, (result, seat) in zip(records, [(result, seat) for result in results for seat in result.seats]):
+            self.assertEqual(int(record['round']), result.number)
+            self.assertEqual(int(record['seed']), result.seed)
+            self.assertEqual(int(record['payout']), seat.payout)
+            self.assertEqual(int(record['player_value']), seat.value)
+            self.assertEqual(record['player_cards'][:record['player_count']].tolist(), [card.code for card in seat.cards])
+            self.assertEqual(int(record['actions']), seat.actions)
+
+    def test_appends_and_chunks(self):
+        for seed in (1, 2):
+            with HandLogWriter(self.path) as log:
+                simulate(100, seed=seed, recorder=log)
+        self.assertEqual(sum(len(chunk) for chunk in iter_chunks(self.path, size=7)), 200)
+
+    def test_keeps_deck_count(self):
+        with HandLogWriter(self.path, decks=6) as log:
+            self.assertRaises(ValueError, HeadlessGame, 1, 100, recorder=log)
+            simulate(10, decks=6, recorder=log)
+        self.assertEqual(check_header(self.path), 6)
+        self.assertRaises(ValueError, HandLogWriter, self.path)
+
+    def test_rejects_other_files(self):
+        with open(self.path, 'wb') as file:
+            file.write(b'not a log at all')
+        self.assertRaises(ValueError, read_log, self.path)
+
+class TestReplay(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'hands.bjl')
+
+    def test_replays_rounds_exactly(self):
+        game = HeadlessGame(3, 10**6, strategy=stand_on(15), seed=99, decks=2, penetration=0.9)
+        replayer = Replayer(decks=2)
+        for result in game.play_rounds(500):
+            self.assertEqual(replayer.replay_result(result), result, f"Round {result.number} should replay identically.")
+
+    def test_rejects_impossible_decisions(self):
+        result = next(iter(HeadlessGame(1, 100, strategy=stand_on(21), seed=4).play_rounds(1)))
+        seats = [(seat.seat, seat.bet, (1 << 16) - 1, 16) for seat in result.seats]  # Hit sixteen times
+        self.assertRaises(ReplayError, Replayer().replay, result.seed, result.position, seats)
+
+    def test_verifies_log(self):
+        with HandLogWriter(self.path, decks=6) as log:
+            list(HeadlessGame(2, 10**6, strategy=stand_on(16), seed=5, decks=6, recorder=log).play_rounds(2000))
+        self.assertEqual(verify_log(self.path, chunk_size=333), [], "An untouched log should replay cleanly.")
+        records = read_log(self.path)
+        offset = 16 + 41 * records.dtype.itemsize + records.dtype.fields['payout'][1]
+        with open(self.path, 'r+b') as file:
+            file.seek(offset)
+            file.write((int(records['payout'][41]) + 1).to_bytes(4, 'little'))
+        del records
+        self.assertEqual(verify_log(self.path), [21], "The round with a tampered payout should be reported.")
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'session.bjck')
+
+    def new_game(self):
+        return HeadlessGame(3, 500, strategy=stand_on(16), bet_strategy=flat_bet(5), seed=8, decks=4, penetration=0.8)
+
+    def test_resume_matches_uninterrupted_session(self):
+        expected = Aggregate()
+        for result in self.new_game().play_rounds(400):
+            expected.add_round(result)
+
+        game, stats = self.new_game(), Aggregate()
+        with Checkpointer(self.path, compact_every=7) as checkpoints:
+            for result in game.play_rounds(230):
+                stats.add_round(result)
+                if result.number % 10 == 0:
+                    checkpoints.save(game, stats)
+        # Killed after round 230: the last checkpoint was taken after round 230 too, so nothing is lost
+        game, stats = self.new_game(), Aggregate()
+        self.assertTrue(resume(self.path, game, stats))
+        self.assertEqual(game.rounds_played, 230)
+        for result in game.play_rounds(170):
+            stats.add_round(result)
+        self.assertEqual((stats.count, stats.mean, stats.outcomes, stats.max_drawdown), (expected.count, expected.mean, expected.outcomes, expected.max_drawdown),
+                         "A resumed session should finish exactly like an uninterrupted one.")
+
+    def test_restores_buffered_shuffler_and_hands(self):
+        game = Game(2, 100, decks=2)
+        game.initial_deal()
+        with Checkpointer(self.path) as checkpoints:
+            checkpoints.save(game)
+        expected = [game.deck.deal() for _ in range(300)]  # Runs past the end of the shoe and reshuffles
+
+        shared = make_shuffler()
+        words = shared.words
+        restored = Game(2, 100, decks=2)
+        resume(self.path, restored)
+        self.assertIs(shared.words, words, "Restoring a game should leave the shuffler other shoes share alone.")
+        self.assertEqual([str(player['hand']) for player in restored.players], [str(player['hand']) for player in game.players])
+        self.assertEqual([restored.deck.deal() for _ in range(300)], expected, "The shoe and its generator should carry on identically.")
+
+    def test_refuses_shared_shuffler(self):
+        game = Game(1, 100)
+        game.deck.shuffler = make_shuffler()
+        with Checkpointer(self.path) as checkpoints:
+            self.assertRaises(ValueError, checkpoints.save, game)
+
+    def test_ignores_torn_entry(self):
+        game = self.new_game()
+        with Checkpointer(self.path) as checkpoints:
+            checkpoints.save(game)
+            list(game.play_rounds(5))
+            checkpoints.save(game)
+        with open(self.path, 'ab') as file:
+            file.write(b'\x40\x00\x00\x00partial')
+        restored = self.new_game()
+        resume(self.path, restored)
+        self.assertEqual(restored.rounds_played, 5, "An incomplete final entry should be skipped.")
+        self.assertEqual(len(read_checkpoint(self.path)), 6)
+
+class TestTables(unittest.TestCase):
+
+    def test_matches_single_seat_expectation(self):
+        stats = RunningStats()
+        for result in Tables(4000, 3, 10**9, decks=6, seed=1).play_rounds(50):
+            stats.add_batch(result)
+        expected = simulate_batch(500000, seed=2).mean()
+        self.assertEqual(stats.count, 600000)
+        self.assertAlmostEqual(stats.mean, expected, delta=0.01, msg="Seats should have the same expectation as independent rounds.")
+
+    def test_players_drop_out_when_broke(self):
+        tables = Tables(20, 6, 3, bet=lambda funds: funds, seed=5)  # Every seat stakes everything it has
+        rounds = sum(1 for _ in tables.play_rounds(10**6))
+        self.assertEqual(rounds, tables.rounds_played)
+        self.assertFalse(tables.active.any(), "Play should stop once every seat is out of funds.")
+        self.assertEqual(tables.funds.min(), 0, "Funds should never go negative.")
+
+    def test_settles_bets(self):
+        tables = Tables(500, 4, 100, bet=lambda funds: funds // 10, seed=9)
+        result = tables.play_round()
+        self.assertTrue(set(result.net.tolist()) <= {-10, 0, 10}, "Each seat should win, push or lose its bet of 10.")
+        self.assertEqual(int(tables.funds.sum()), 500 * 4 * 100 + int(result.net.sum()))
+        self.assertTrue((result.net[result.player_values > 21] == -10).all(), "A bust seat should always lose its bet.")
+
+    def test_rejects_oversized_tables(self):
+        self.assertRaises(ValueError, Tables, 1, 30, 100, decks=1)
+
+class TestOutput(unittest.TestCase):
+
+    def play_round(self, output):
+        game = Game(3, 100, output=output)
+        game.collect_bets = lambda: None
+        for player in game.players:
+            player['bet'] = 10
+        game.initial_deal()
+        game.dealer_turn()
+        game.determine_winners()
+        return game
+
+    def test_game_emits_events(self):
+        sink = RecordingSink()
+        game = self.play_round(sink)
+        events = [event for event, fields in sink.events]
+        self.assertEqual(events[-4], 'dealer_hand')
+        self.assertEqual(sink.events[-4][1]['hand'].cards, tuple(game.dealer.cards), "Hands should be kept as cards, not pre-rendered text.")
+        self.assertEqual(render('dealer_hand', sink.events[-4][1]), render('dealer_hand', {'hand': game.dealer}))
+        self.assertTrue(set(events[-3:]) <= {'win', 'tie', 'loss', 'player_bust'}, "Each player should get one result event.")
+
+    def test_recorded_hands_do_not_change(self):
+        sink = RecordingSink()
+        hand = Hand()
+        hand.add_card(Card('Hearts', '9'))
+        sink.emit('hand', hand=hand)
+        hand.add_card(Card('Spades', '5'))
+        self.assertEqual(render('hand', sink.events[0][1]), "9 of Hearts (Value: 9)", "A recorded hand should stay as it was sent.")
+
+    def test_console_keeps_original_text(self):
+        captured = io.StringIO()
+        with contextlib.redirect_stdout(captured):
+            ConsoleSink().emit('loss', player=2, bet=5, funds=95)
+            self.play_round(NullSink())  # Nothing at all reaches the terminal
+        self.assertEqual(captured.getvalue(), "Player 2 loses their bet of 5 (total funds: 95).\n")
+
+    def test_buffered_sink_writes_in_batches(self):
+        file = io.StringIO()
+        sink = BufferedSink(file, buffer_lines=100)
+        for _ in range(30):
+            self.play_round(sink)
+        written = file.getvalue()
+        self.assertTrue(written.endswith('\n'), "Only whole batches should be written.")
+        self.assertLess(written.count("Dealer's final hand"), 30, "The last partial batch should wait for a flush.")
+        sink.close()
+        self.assertEqual(file.getvalue().count("Dealer's final hand"), 30)
+
+class TestBankrolls(unittest.TestCase):
+
+    def test_every_trajectory_finishes(self):
+        report = risk_of_ruin(3000, 10, target=20, seed=1, decks=2)
+        self.assertEqual(report.unfinished(), 0.0)
+        self.assertAlmostEqual(report.risk_of_ruin() + report.target_chance(), 1.0)
+        ruined = report.ruined_at >= 0
+        self.assertTrue((report.final_funds[ruined] == 0).all(), "A ruined trajectory should end with no funds.")
+        self.assertTrue((report.final_funds[~ruined] >= 20).all())
+        self.assertTrue((report.max_drawdown[ruined] >= 10).all(), "Ruin means losing at least the starting bankroll.")
+        self.assertGreater(report.risk_of_ruin(), 0.5, "Flat betting into a house edge should usually be ruined first.")
+
+    def test_round_limit_and_proportional_bets(self):
+        report = risk_of_ruin(500, 1000, bet=ProportionalBets(0.01), seed=2, max_rounds=50)
+        self.assertEqual((report.rounds, report.unfinished()), (50, 1.0))
+        self.assertEqual(report.ruin_time_percentiles(), {})
+
+    def test_count_bets_follow_the_shoe(self):
+        bankrolls = Bankrolls(200, 500, bet=CountBets(unit=2, max_units=4), seed=3)
+        for _ in bankrolls.play_rounds(40):
+            dealt = [bankrolls.tags[value] for value in bankrolls.cards[0, :bankrolls.position[0]]]
+            self.assertEqual(bankrolls.running_count()[0], sum(dealt), "The running count should match the cards dealt.")
+            self.assertTrue(set(bankrolls.bets[:, 0].tolist()) <= {2, 4, 6, 8})
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_compare_flags_regressions(self):
+        baseline = {'shuffle': {'median': 1.0}, 'deal': {'median': 1.0}}
+        results = {'shuffle': {'median': 1.25}, 'deal': {'median': 1.05}, 'deck_init': {'median': 9.0}}
+        regressions = performance_tests.compare(results, baseline, 0.10)
+        self.assertEqual([name for name, *_ in regressions], ['shuffle'], "Only slowdowns past the threshold should be flagged.")
+
+    def test_measure_reports_statistics(self):
+        result = performance_tests.measure(performance_tests.bench_adjust_for_aces, repeats=3, warmup=0, target=0.001)
+        self.assertLessEqual(result['min'], result['median'])
+        self.assertGreaterEqual(result['iqr'], 0)
+
 if __name__ == '__main__':
     unittest.main()